@@ -0,0 +1,57 @@
+"""Add HNSW index on event embeddings
+
+Revision ID: 3f9c2a1d4b7e
+Revises: 7736b176d0ba
+Create Date: 2026-10-15 10:12:41.503118
+
+"""
+import re
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9c2a1d4b7e'
+down_revision: Union[str, Sequence[str], None] = '7736b176d0ba'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _build_settings() -> list[str]:
+    """SET statements for the index build, from optional -x arguments.
+
+    The server's own settings apply unless overridden, e.g. on a large host:
+    alembic -x maintenance_work_mem=2GB -x max_parallel_maintenance_workers=7 upgrade head
+    """
+    args = context.get_x_argument(as_dictionary=True)
+    statements = []
+    work_mem = args.get("maintenance_work_mem")
+    if work_mem:
+        if not re.fullmatch(r"\d+\s*(kB|MB|GB)?", work_mem):
+            raise ValueError(f"Invalid maintenance_work_mem: {work_mem!r}")
+        statements.append(f"SET maintenance_work_mem = '{work_mem}'")
+    workers = args.get("max_parallel_maintenance_workers")
+    if workers:
+        statements.append(f"SET max_parallel_maintenance_workers = {int(workers)}")
+    return statements
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    with op.get_context().autocommit_block():
+        for statement in _build_settings():
+            op.execute(statement)
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_events_embedding_hnsw "
+            "ON events USING hnsw (embedding vector_cosine_ops) "
+            "WITH (m = 24, ef_construction = 128)"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_events_embedding_hnsw")
@@ -0,0 +1,43 @@
+"""Store encrypted kubeconfigs as bytes
+
+Revision ID: 5d2e8f1a7c30
+Revises: c47a9e2b5d18
+Create Date: 2026-10-15 14:02:37.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d2e8f1a7c30'
+down_revision: Union[str, Sequence[str], None] = 'c47a9e2b5d18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Fernet tokens are ASCII, so the stored text converts byte-for-byte
+    op.alter_column(
+        'clusters',
+        'kubeconfig_encrypted',
+        type_=sa.LargeBinary(),
+        existing_type=sa.Text(),
+        existing_nullable=False,
+        postgresql_using="convert_to(kubeconfig_encrypted, 'UTF8')",
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.alter_column(
+        'clusters',
+        'kubeconfig_encrypted',
+        type_=sa.Text(),
+        existing_type=sa.LargeBinary(),
+        existing_nullable=False,
+        postgresql_using="convert_from(kubeconfig_encrypted, 'UTF8')",
+    )
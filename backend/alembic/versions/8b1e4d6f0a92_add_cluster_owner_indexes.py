@@ -0,0 +1,35 @@
+"""Add per-owner indexes on clusters
+
+Revision ID: 8b1e4d6f0a92
+Revises: 3f9c2a1d4b7e
+Create Date: 2026-10-15 11:03:27.918244
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b1e4d6f0a92'
+down_revision: Union[str, Sequence[str], None] = '3f9c2a1d4b7e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('idx_clusters_owner_name', 'clusters', ['owner_id', 'name'])
+    op.create_index(
+        'idx_clusters_owner_active',
+        'clusters',
+        ['owner_id'],
+        postgresql_where=sa.text('is_active = true'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_clusters_owner_active', table_name='clusters')
+    op.drop_index('idx_clusters_owner_name', table_name='clusters')
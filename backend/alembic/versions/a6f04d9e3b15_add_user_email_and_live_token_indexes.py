@@ -0,0 +1,41 @@
+"""Add lower(email) and live refresh token indexes
+
+Revision ID: a6f04d9e3b15
+Revises: e91b3c6d2f47
+Create Date: 2026-10-15 17:26:44.071562
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a6f04d9e3b15'
+down_revision: Union[str, Sequence[str], None] = 'e91b3c6d2f47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Fails if two accounts differ only by email case; merge those first
+    op.create_index(
+        'idx_users_email_lower',
+        'users',
+        [sa.text('lower(email)')],
+        unique=True,
+    )
+    op.create_index(
+        'idx_refresh_tokens_user_active',
+        'refresh_tokens',
+        ['user_id'],
+        postgresql_where=sa.text('revoked = false'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_refresh_tokens_user_active', table_name='refresh_tokens')
+    op.drop_index('idx_users_email_lower', table_name='users')
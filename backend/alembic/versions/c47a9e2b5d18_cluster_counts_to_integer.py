@@ -0,0 +1,46 @@
+"""Store cluster node/pod counts as integers
+
+Revision ID: c47a9e2b5d18
+Revises: 8b1e4d6f0a92
+Create Date: 2026-10-15 11:41:09.627351
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c47a9e2b5d18'
+down_revision: Union[str, Sequence[str], None] = '8b1e4d6f0a92'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for column in ('node_count', 'pod_count'):
+        op.execute(f"UPDATE clusters SET {column} = 0 WHERE {column} IS NULL")
+        op.alter_column(
+            'clusters',
+            column,
+            type_=sa.Integer(),
+            existing_type=sa.Float(),
+            postgresql_using=f'{column}::integer',
+            server_default='0',
+            nullable=False,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for column in ('node_count', 'pod_count'):
+        op.alter_column(
+            'clusters',
+            column,
+            type_=sa.Float(),
+            existing_type=sa.Integer(),
+            server_default=None,
+            nullable=True,
+        )
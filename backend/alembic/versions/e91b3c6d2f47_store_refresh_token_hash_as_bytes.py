@@ -0,0 +1,43 @@
+"""Store refresh token hashes as raw SHA-256 digests
+
+Revision ID: e91b3c6d2f47
+Revises: 5d2e8f1a7c30
+Create Date: 2026-10-15 16:48:05.530917
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e91b3c6d2f47'
+down_revision: Union[str, Sequence[str], None] = '5d2e8f1a7c30'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Existing rows hold the hex digest; the unique index is rebuilt in place
+    op.alter_column(
+        'refresh_tokens',
+        'token_hash',
+        type_=sa.LargeBinary(32),
+        existing_type=sa.String(255),
+        existing_nullable=False,
+        postgresql_using="decode(token_hash, 'hex')",
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.alter_column(
+        'refresh_tokens',
+        'token_hash',
+        type_=sa.String(255),
+        existing_type=sa.LargeBinary(32),
+        existing_nullable=False,
+        postgresql_using="encode(token_hash, 'hex')",
+    )
@@ -1,6 +1,9 @@
 """
 Authentication API Routes
 """
+import time
+from uuid import UUID
+
 from fastapi import APIRouter, HTTPException, Depends, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
@@ -10,8 +13,12 @@ from app.models import (
     UserResponse,
     TokenResponse,
     TokenRefreshRequest,
+    Principal,
 )
 from app.services import auth_service
+from app.core.cache import TTLCache
+from app.core.config import settings
+from jose import jwt
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 security = HTTPBearer(auto_error=False)
@@ -20,6 +27,12 @@ security = HTTPBearer(auto_error=False)
 from app.database import get_db
 from sqlalchemy.ext.asyncio import AsyncSession
 
+# Recently verified access tokens -> user, skips JWT verification + user lookup
+_token_cache = TTLCache(
+    maxsize=4096,
+    ttl=min(settings.access_token_expire_minutes * 60, 15),
+)
+
 
 # Helper to get current user from token
 async def get_current_user(
@@ -33,16 +46,52 @@ async def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    user = await auth_service.get_current_user(credentials.credentials, db)
+    token = credentials.credentials
+    user = _token_cache.get(token)
+    if user:
+        return user
+    
+    user = await auth_service.get_current_user(token, db)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid or expired token",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    
+    # Signature was verified above; never cache past the token's own expiry
+    exp = jwt.get_unverified_claims(token).get("exp", 0)
+    _token_cache.set(token, user, ttl=exp - time.time())
     return user
 
 
+async def get_current_principal(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+) -> Principal:
+    """
+    Lightweight auth for routes that only need the caller's id.
+    Verifies the access token and returns its claims without loading the user;
+    use get_current_user where the full user record is needed.
+    """
+    if not credentials:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    payload = auth_service.decode_access_token(credentials.credentials)
+    try:
+        user_id = UUID(payload["sub"])
+    except (TypeError, KeyError, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return Principal(id=user_id, email=payload.get("email"))
+
+
 async def get_optional_user(
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ):
@@ -103,8 +152,15 @@ async def refresh_token(data: TokenRefreshRequest, db: AsyncSession = Depends(ge
 
 
 @router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
-async def logout(data: TokenRefreshRequest, db: AsyncSession = Depends(get_db)):
-    """Logout and revoke refresh token"""
+async def logout(
+    data: TokenRefreshRequest,
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: AsyncSession = Depends(get_db)
+):
+    """Logout: revoke the refresh token and deny the access token in this process"""
+    if credentials:
+        auth_service.revoke_access_token(credentials.credentials)
+        _token_cache.pop(credentials.credentials)
     await auth_service.logout(data.refresh_token, db)
     return None
 
@@ -126,7 +182,6 @@ async def get_me(user = Depends(get_current_user)):
 # ==================== OAuth Routes ====================
 from fastapi.responses import RedirectResponse
 from app.services import oauth_service
-from app.core.config import settings
 
 
 @router.get("/oauth/{provider}")
@@ -175,8 +230,15 @@ async def oauth_callback(provider: str, code: str = None, state: str = None, err
     
     redirect_uri = f"{settings.backend_url}/api/auth/oauth/{provider}/callback"
     
+    # Validate the signed state issued by oauth_redirect (CSRF protection)
+    verified = oauth_service.verify_state(state) if state else None
+    if not verified or verified != (provider, redirect_uri):
+        return RedirectResponse(
+            url=f"{settings.frontend_url}/login?error=invalid_state"
+        )
+    
     # Handle OAuth callback
-    user, error_msg = await oauth_service.handle_callback(provider, code, redirect_uri)
+    user, error_msg = await oauth_service.handle_callback(provider, code, redirect_uri, db)
     if error_msg:
         return RedirectResponse(
             url=f"{settings.frontend_url}/login?error={error_msg}"
@@ -1,5 +1,7 @@
 """Clusters API routes."""
 
+import asyncio
+
 from fastapi import APIRouter
 from app.k8s import k8s_client, K8sClient
 
@@ -7,10 +9,12 @@ router = APIRouter()
 
 
 @router.get("")
-async def list_contexts():
+async def list_contexts(refresh: bool = False):
     """List all available Kubernetes contexts."""
+    # A cache miss or refresh reads and parses the kubeconfig; keep it off the loop
+    contexts = await asyncio.to_thread(K8sClient.get_contexts, refresh=refresh)
     return {
-        "contexts": K8sClient.get_contexts(),
+        "contexts": contexts,
         "current": k8s_client.connected,
     }
 
@@ -18,13 +22,14 @@ async def list_contexts():
 @router.get("/info")
 async def cluster_info():
     """Get current cluster information."""
-    return k8s_client.get_cluster_info()
+    return await k8s_client.get_cluster_info()
 
 
 @router.post("/switch/{context_name}")
 async def switch_context(context_name: str):
     """Switch to a different cluster context."""
-    success = k8s_client.switch_context(context_name)
+    # Loading a kubeconfig can run exec credential plugins; keep it off the loop
+    success = await asyncio.to_thread(k8s_client.switch_context, context_name)
     return {
         "success": success,
         "context": context_name,
@@ -36,4 +41,4 @@ async def switch_context(context_name: str):
 @router.get("/namespaces")
 async def list_namespaces():
     """List all namespaces."""
-    return {"namespaces": k8s_client.list_namespaces()}
+    return {"namespaces": await k8s_client.list_namespaces()}
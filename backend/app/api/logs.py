@@ -1,13 +1,38 @@
 """Logs API routes."""
 
 from fastapi import APIRouter
+from fastapi.responses import StreamingResponse
 from app.k8s import k8s_client
 
 router = APIRouter()
 
 
 @router.get("/pod/{namespace}/{name}")
-async def get_pod_logs(namespace: str, name: str, tail: int = 100):
-    """Get logs for a specific pod."""
-    logs = k8s_client.get_pod_logs(name, namespace, tail_lines=tail)
-    return {"logs": logs, "pod": name, "namespace": namespace}
+async def get_pod_logs(
+    namespace: str,
+    name: str,
+    tail: int = 100,
+    stream: bool = True,
+    follow: bool = False,
+):
+    """Get logs for a specific pod.
+
+    Streams lines as Server-Sent Events by default; pass `stream=0` to get
+    the whole tail in a single JSON response. `follow=1` keeps the stream
+    open for new lines (limited to `k8s_max_log_streams` at once).
+    """
+    if not stream:
+        logs = await k8s_client.get_pod_logs(name, namespace, tail_lines=tail)
+        return {"logs": logs, "pod": name, "namespace": namespace}
+
+    async def events():
+        async for line in k8s_client.stream_pod_logs(
+            name, namespace, tail_lines=tail, follow=follow
+        ):
+            yield f"data: {line}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -9,5 +9,4 @@ router = APIRouter()
 @router.get("")
 async def list_namespaces():
     """List all namespaces."""
-    namespaces_data = k8s_client.list_namespaces()
-    return {"namespaces": [ns["name"] for ns in namespaces_data]}
+    return {"namespaces": await k8s_client.list_namespace_names()}
@@ -9,4 +9,4 @@ router = APIRouter()
 @router.get("")
 async def list_nodes():
     """List all cluster nodes."""
-    return {"nodes": k8s_client.list_nodes()}
+    return {"nodes": await k8s_client.list_nodes()}
@@ -9,16 +9,25 @@ class Settings(BaseSettings):
     
     app_name: str = "xKube"
     debug: bool = True
+    debug_cache_endpoint: bool = False  # Expose /api/debug/cache (authenticated users only)
+    
+    # Database
+    db_statement_cache_size: int = 100  # Prepared statements cached per asyncpg connection (0 behind pgbouncer)
     
     # K8s
     kubeconfig_path: str | None = None
     k8s_insecure: bool = True
+    k8s_max_workers: int = 32  # Threads for blocking kubernetes client calls
+    k8s_max_log_streams: int = 16  # Followed log streams open at once (each holds its own thread)
+    k8s_list_cache_ttl: float = 2.0  # Seconds to reuse list responses
     
     # JWT Auth
     jwt_secret_key: str = secrets.token_urlsafe(32)
     jwt_algorithm: str = "HS256"
     access_token_expire_minutes: int = 15
     refresh_token_expire_days: int = 7
+    scrypt_log_n: int = 15  # log2 of the scrypt cost for new password hashes (2**15 -> 32 MiB)
+    scrypt_target_ms: int = 0  # If set, raise the scrypt cost at startup until a hash takes about this long
     
     # Registration
     allow_registration: bool = False  # Set to False to disable public registration
@@ -30,6 +39,7 @@ class Settings(BaseSettings):
     # OAuth - GitHub
     github_client_id: str | None = None
     github_client_secret: str | None = None
+    github_parallel_emails: bool = True  # Fetch profile and emails concurrently
     
     # External Auth
     external_auth_provider: str | None = None  # keycloak, auth0, oidc
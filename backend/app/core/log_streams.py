@@ -0,0 +1,56 @@
+"""Threads for followed pod log streams."""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, Optional
+
+from app.core.config import settings
+
+
+class LogStreamLimitError(RuntimeError):
+    """Raised when every followed log stream slot is taken."""
+
+
+class LogStreamPool:
+    """Runs blocking reads of followed log streams on their own threads.
+
+    A quiet followed stream holds a thread until the apiserver sends data, so
+    these reads stay off the default executor (listings, password hashing),
+    and at most `max_streams` can be open at once.
+    """
+
+    def __init__(self, max_streams: int):
+        self.max_streams = max_streams
+        self._open = 0
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_streams, thread_name_prefix="k8s-logs"
+        )
+
+    def acquire(self) -> None:
+        """Reserve a stream slot, or raise LogStreamLimitError."""
+        if self._open >= self.max_streams:
+            raise LogStreamLimitError(
+                f"Too many followed log streams open (limit {self.max_streams})"
+            )
+        self._open += 1
+
+    def release(self) -> None:
+        """Give back a slot reserved with `acquire`."""
+        self._open -= 1
+
+    async def read(self, chunks: Iterator[bytes]) -> Optional[bytes]:
+        """Next chunk from a followed stream, or None once it ends."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, next, chunks, None)
+
+    def stats(self) -> dict[str, int]:
+        """Open and maximum stream counts."""
+        return {"open": self._open, "max": self.max_streams}
+
+    def shutdown(self) -> None:
+        """Stop the threads without waiting for blocked reads."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Shared by every log streaming endpoint
+log_streams = LogStreamPool(settings.k8s_max_log_streams)
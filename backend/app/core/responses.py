@@ -0,0 +1,14 @@
+"""Custom response classes."""
+
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+
+
+class ORJSONResponse(JSONResponse):
+    """JSON response rendered with orjson (bytes out, no str round-trip)."""
+
+    def render(self, content: Any) -> bytes:
+        # UTC_Z: timestamps match Pydantic's "...Z" from response_model routes
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z)
@@ -0,0 +1,27 @@
+"""YAML helpers backed by libyaml when available."""
+
+from pathlib import Path
+from typing import Any
+
+import yaml
+
+try:
+    from yaml import CSafeDumper as SafeDumper, CSafeLoader as SafeLoader
+except ImportError:  # PyYAML built without libyaml
+    from yaml import SafeDumper, SafeLoader
+
+
+def load_yaml(stream: str | bytes) -> Any:
+    """Parse a YAML document with the fastest safe loader."""
+    return yaml.load(stream, Loader=SafeLoader)
+
+
+def load_yaml_file(path: str | Path) -> Any:
+    """Read and parse a YAML file (blocking; run it in a worker thread)."""
+    with open(path, 'rb') as f:
+        return load_yaml(f)
+
+
+def dump_yaml(data: Any) -> str:
+    """Serialize data to YAML with the fastest safe dumper."""
+    return yaml.dump(data, Dumper=SafeDumper)
@@ -1,11 +1,18 @@
 """
 Database configuration and engine setup
 """
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from fastapi import Request
+from sqlalchemy import event, make_url
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.orm import declarative_base
-from sqlalchemy.pool import NullPool
+from sqlalchemy.pool import AsyncAdaptedQueuePool, StaticPool
 import os
 
+from app.core.config import settings
+
 # Database URL - for development, use PostgreSQL
 DATABASE_URL = os.getenv(
     "DATABASE_URL",
@@ -15,15 +22,52 @@ DATABASE_URL = os.getenv(
 # For SQLite fallback (development)
 # DATABASE_URL = "sqlite+aiosqlite:///./xkube.db"
 
+# Connection pool settings - a file-backed SQLite database keeps a few
+# connections (and their page cache) warm between sessions, an in-memory one
+# lives on its single connection, and PostgreSQL gets a sized pool
+if "sqlite" in DATABASE_URL and make_url(DATABASE_URL).database in (None, "", ":memory:"):
+    pool_options = {"poolclass": StaticPool}
+elif "sqlite" in DATABASE_URL:
+    pool_options = {
+        "poolclass": AsyncAdaptedQueuePool,
+        "pool_size": 5,
+        "max_overflow": 10,
+    }
+else:
+    pool_options = {
+        "pool_size": 20,
+        "max_overflow": 40,
+        "pool_recycle": 1800,
+    }
+
+# asyncpg prepares each statement once per pooled connection and reuses the
+# plan; both caches are sized explicitly so they can be turned off for pgbouncer
+if "asyncpg" in DATABASE_URL:
+    pool_options["connect_args"] = {
+        "statement_cache_size": settings.db_statement_cache_size,
+        "prepared_statement_cache_size": settings.db_statement_cache_size,
+    }
+
+# SQL statement logging is opt-in (debug mode + SQL_ECHO=1)
+SQL_ECHO = settings.debug and os.getenv("SQL_ECHO") == "1"
+
 # Create async engine
 engine = create_async_engine(
     DATABASE_URL,
-    echo=True,  # Set to False in production
+    echo=SQL_ECHO,
     future=True,
     pool_pre_ping=True,
-    poolclass=NullPool if "sqlite" in DATABASE_URL else None,
+    **pool_options,
 )
 
+# SQLite leaves foreign keys (and ON DELETE CASCADE) off unless asked
+if "sqlite" in DATABASE_URL:
+    @event.listens_for(engine.sync_engine, "connect")
+    def _enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
 # Create async session factory
 AsyncSessionLocal = async_sessionmaker(
     engine,
@@ -33,23 +77,28 @@ AsyncSessionLocal = async_sessionmaker(
     autoflush=False,
 )
 
+# Session factory for read-only requests: AUTOCOMMIT skips the BEGIN/COMMIT
+# round-trips and shares the main engine's connection pool
+ReadOnlySessionLocal = async_sessionmaker(
+    engine.execution_options(isolation_level="AUTOCOMMIT"),
+    class_=AsyncSession,
+    expire_on_commit=False,
+    autocommit=False,
+    autoflush=False,
+)
+
 # Base class for models
 Base = declarative_base()
 
 
-async def get_db():
+async def get_db(request: Request) -> AsyncSession:
     """
     Dependency for FastAPI routes to get database session
+
+    The session is request-scoped: app.middleware.db opens it, commits or
+    rolls it back, and closes it once the response is ready.
     """
-    async with AsyncSessionLocal() as session:
-        try:
-            yield session
-            await session.commit()
-        except Exception:
-            await session.rollback()
-            raise
-        finally:
-            await session.close()
+    return request.state.db
 
 
 async def init_db():
@@ -65,3 +114,26 @@ async def close_db():
     Close database connections
     """
     await engine.dispose()
+
+
+@asynccontextmanager
+async def rollback_session() -> AsyncIterator[AsyncSession]:
+    """
+    Session inside one outer transaction that is always rolled back
+
+    Service methods that commit() or rollback() only release or roll back
+    SAVEPOINTs here, so scripts can run real code paths in a single
+    transaction without leaving rows behind or paying for COMMITs.
+    """
+    async with engine.connect() as conn:
+        outer = await conn.begin()
+        try:
+            async with AsyncSession(
+                bind=conn,
+                expire_on_commit=False,
+                autoflush=False,
+                join_transaction_mode="create_savepoint",
+            ) as session:
+                yield session
+        finally:
+            await outer.rollback()
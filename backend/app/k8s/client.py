@@ -1,21 +1,49 @@
 """Kubernetes client wrapper."""
 
+import asyncio
+import os
+import socket
+import orjson
 import urllib3
-from typing import Any
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator
 from kubernetes import client, config
 from kubernetes.client.rest import ApiException
+from kubernetes.config.kube_config import KUBE_CONFIG_DEFAULT_LOCATION
 
+from app.core.cache import TTLCache
 from app.core.config import settings
+from app.core.log_streams import LogStreamLimitError, log_streams
 
 # Disable SSL warnings when using insecure mode
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+# Keep idle apiserver connections alive instead of re-handshaking TLS
+_SOCKET_OPTIONS = urllib3.connection.HTTPConnection.default_socket_options + [
+    (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+]
+if hasattr(socket, "TCP_KEEPIDLE"):
+    _SOCKET_OPTIONS.append((socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, 60))
+
+
+def tune_connection_pool(configuration: client.Configuration) -> client.Configuration:
+    """Size the connection pool and enable TCP keep-alive before building an ApiClient."""
+    # One pooled connection per worker thread, reused across calls
+    configuration.connection_pool_maxsize = settings.k8s_max_workers
+    configuration.retries = urllib3.Retry(total=1, backoff_factor=0.1)
+    configuration.socket_options = _SOCKET_OPTIONS
+    return configuration
+
 
 class K8sClient:
     """Kubernetes API client wrapper."""
     
     _instance = None
     _current_context: str | None = None
+    # Concurrent per-namespace requests when listing across all namespaces
+    NAMESPACE_FANOUT = 8
+    # (kubeconfig (path, mtime) key, parsed contexts) from the last get_contexts()
+    _contexts_cache: tuple[tuple, list[dict[str, Any]]] | None = None
 
     def __new__(cls):
         if cls._instance is None:
@@ -28,8 +56,11 @@ class K8sClient:
         self._api_client: client.ApiClient | None = None
         self._core_v1: client.CoreV1Api | None = None
         self._apps_v1: client.AppsV1Api | None = None
+        self._version_api: client.VersionApi | None = None
         self._connected = False
         self._error: str | None = None
+        # Short-lived list results so polling clients share upstream calls
+        self._list_cache = TTLCache(maxsize=64, ttl=settings.k8s_list_cache_ttl)
         self._load_config(context)
 
     def _load_config(self, context: str | None = None) -> None:
@@ -47,9 +78,11 @@ class K8sClient:
             if settings.k8s_insecure:
                 configuration.verify_ssl = False
             
-            self._api_client = client.ApiClient(configuration)
+            self._api_client = client.ApiClient(tune_connection_pool(configuration))
             self._core_v1 = client.CoreV1Api(self._api_client)
             self._apps_v1 = client.AppsV1Api(self._api_client)
+            self._version_api = client.VersionApi(self._api_client)
+            self._list_cache.clear()
             K8sClient._current_context = context
             self._connected = True
             self._error = None
@@ -71,12 +104,35 @@ class K8sClient:
         return self._error
 
     @staticmethod
-    def get_contexts() -> list[dict[str, Any]]:
-        """Get all available kubernetes contexts."""
+    def _kubeconfig_key() -> tuple | None:
+        """Identify the kubeconfig file(s) by path and modification time."""
+        paths = settings.kubeconfig_path or KUBE_CONFIG_DEFAULT_LOCATION
+        try:
+            return tuple(
+                (path, os.stat(os.path.expanduser(path)).st_mtime_ns)
+                for path in paths.split(os.pathsep)
+                if path
+            )
+        except OSError:
+            return None
+
+    @classmethod
+    def get_contexts(cls, refresh: bool = False) -> list[dict[str, Any]]:
+        """Get all available kubernetes contexts.
+
+        The parsed result is reused until the kubeconfig file changes on disk.
+        """
+        key = cls._kubeconfig_key()
+        cached = cls._contexts_cache
+        if not refresh and key is not None and cached and cached[0] == key:
+            return cached[1]
+
         try:
-            contexts, active = config.list_kube_config_contexts()
+            contexts, active = config.list_kube_config_contexts(
+                config_file=settings.kubeconfig_path
+            )
             active_name = active.get("name", "") if active else ""
-            return [
+            result = [
                 {
                     "name": ctx.get("name", ""),
                     "cluster": ctx.get("context", {}).get("cluster", ""),
@@ -89,7 +145,10 @@ class K8sClient:
         except Exception:
             return []
 
-    def get_cluster_info(self) -> dict[str, Any]:
+        cls._contexts_cache = (key, result) if key is not None else None
+        return result
+
+    async def get_cluster_info(self) -> dict[str, Any]:
         """Get cluster information."""
         if not self._connected or not self._core_v1:
             return {
@@ -101,16 +160,18 @@ class K8sClient:
             }
         
         try:
-            version = client.VersionApi(self._api_client).get_code()
-            nodes = self._core_v1.list_node()
-            pods = self._core_v1.list_pod_for_all_namespaces(limit=1000)
+            version, nodes, pods = await asyncio.gather(
+                asyncio.to_thread(self._version_api.get_code),
+                asyncio.to_thread(self._count_items, self._core_v1.list_node),
+                asyncio.to_thread(self._count_items, self._core_v1.list_pod_for_all_namespaces),
+            )
             
             return {
                 "name": K8sClient._current_context or "default",
                 "version": f"{version.major}.{version.minor}",
                 "connected": True,
-                "nodes": len(nodes.items),
-                "pods": len(pods.items),
+                "nodes": nodes,
+                "pods": pods,
             }
         except Exception as e:
             return {
@@ -121,201 +182,318 @@ class K8sClient:
                 "pods": 0,
             }
 
-    def list_namespaces(self) -> list[dict[str, Any]]:
+    @staticmethod
+    def _fetch_items(list_call, *args, **kwargs) -> list[dict[str, Any]]:
+        """Call a list endpoint and return the raw JSON items.
+
+        Skips the kubernetes client's model deserialization, which dominates
+        the cost of large list responses.
+        """
+        response = list_call(*args, _preload_content=False, **kwargs)
+        return orjson.loads(response.data).get("items") or []
+
+    @classmethod
+    def _fetch_all_pages(cls, list_call, *args, limit: int, **kwargs) -> list[dict[str, Any]]:
+        """Like `_fetch_items`, but follows `metadata.continue` to the end.
+
+        `limit` only sets the page size; nothing is cut off.
+        """
+        items: list[dict[str, Any]] = []
+        token = None
+        while True:
+            response = list_call(
+                *args, limit=limit, _continue=token, _preload_content=False, **kwargs
+            )
+            body = orjson.loads(response.data)
+            items.extend(body.get("items") or [])
+            token = (body.get("metadata") or {}).get("continue")
+            if not token:
+                return items
+
+    async def _list_items(
+        self, list_call, *args, all_pages: bool = False, **kwargs
+    ) -> list[dict[str, Any]]:
+        """Run `_fetch_items` (or `_fetch_all_pages`) in a worker thread so the
+        event loop stays free.
+
+        Results are cached for a couple of seconds per (endpoint, arguments),
+        and concurrent identical requests share one upstream call.
+        """
+        key = (list_call.__name__, all_pages, args, tuple(sorted(kwargs.items())))
+        fetch = self._fetch_all_pages if all_pages else self._fetch_items
+        return await self._list_cache.get_or_fetch(
+            key,
+            lambda: asyncio.to_thread(fetch, list_call, *args, **kwargs),
+        )
+
+    async def _list_all_namespaces(self, list_call, *, limit: int, **kwargs) -> list[dict[str, Any]]:
+        """List a namespaced resource across the cluster, one listing per namespace.
+
+        Each namespace is paged `limit` items at a time until its continue
+        token runs out, so nothing is truncated. Namespaces are listed
+        NAMESPACE_FANOUT at a time.
+        """
+        namespaces = await self._namespace_names()
+        items: list[dict[str, Any]] = []
+        for i in range(0, len(namespaces), self.NAMESPACE_FANOUT):
+            chunk = namespaces[i:i + self.NAMESPACE_FANOUT]
+            results = await asyncio.gather(
+                *(
+                    self._list_items(list_call, ns, all_pages=True, limit=limit, **kwargs)
+                    for ns in chunk
+                )
+            )
+            for result in results:
+                items.extend(result)
+        return items
+
+    def cache_stats(self) -> dict[str, int]:
+        """Hit/miss counters for the list cache."""
+        return self._list_cache.stats()
+
+    @staticmethod
+    def _count_items(list_call, *args, **kwargs) -> int:
+        """Count the objects behind a list endpoint without downloading them.
+
+        Requests a single item and adds the apiserver's remainingItemCount.
+        """
+        response = list_call(*args, limit=1, _preload_content=False, **kwargs)
+        body = orjson.loads(response.data)
+        remaining = body.get("metadata", {}).get("remainingItemCount") or 0
+        return len(body.get("items") or []) + remaining
+
+    async def _namespace_names(self) -> list[str]:
+        """Names of all namespaces, from the shared list cache."""
+        items = await self._list_items(self._core_v1.list_namespace)
+        return [ns["metadata"]["name"] for ns in items]
+
+    async def list_namespace_names(self) -> list[str]:
+        """List namespace names only (for dropdowns)."""
+        if not self._connected or not self._core_v1:
+            return []
+        try:
+            return await self._namespace_names()
+        except Exception:
+            return []
+
+    async def list_namespaces(self) -> list[dict[str, Any]]:
         """List all namespaces."""
         if not self._connected or not self._core_v1:
             return []
         try:
-            result = self._core_v1.list_namespace()
-            return [
-                {
-                    "name": ns.metadata.name,
-                    "status": ns.status.phase,
-                    "created": ns.metadata.creation_timestamp.isoformat() if ns.metadata.creation_timestamp else None,
-                }
-                for ns in result.items
-            ]
+            items = await self._list_items(self._core_v1.list_namespace)
+            return [self._namespace_to_row(ns) for ns in items]
         except Exception:
             return []
 
-    def list_nodes(self) -> list[dict[str, Any]]:
+    @staticmethod
+    def _namespace_to_row(ns: dict) -> dict[str, Any]:
+        """Project a raw Namespace object onto the API row."""
+        metadata = ns["metadata"]
+        return {
+            "name": metadata["name"],
+            "status": ns.get("status", {}).get("phase"),
+            "created": metadata.get("creationTimestamp"),
+        }
+
+    async def list_nodes(self) -> list[dict[str, Any]]:
         """List all cluster nodes."""
         if not self._connected or not self._core_v1:
             return []
         try:
-            result = self._core_v1.list_node()
-            nodes = []
-            for node in result.items:
-                # Get node status
-                status = "Unknown"
-                for condition in node.status.conditions or []:
-                    if condition.type == "Ready":
-                        status = "Ready" if condition.status == "True" else "NotReady"
-                        break
-                
-                # Get roles
-                roles = []
-                for label, value in (node.metadata.labels or {}).items():
-                    if label.startswith("node-role.kubernetes.io/"):
-                        roles.append(label.split("/")[-1])
-                if not roles:
-                    roles = ["worker"]
-                
-                # Get capacity
-                capacity = node.status.capacity or {}
-                allocatable = node.status.allocatable or {}
-                
-                nodes.append({
-                    "name": node.metadata.name,
-                    "status": status,
-                    "roles": roles,
-                    "version": node.status.node_info.kubelet_version if node.status.node_info else "",
-                    "os": node.status.node_info.operating_system if node.status.node_info else "",
-                    "arch": node.status.node_info.architecture if node.status.node_info else "",
-                    "cpu_capacity": capacity.get("cpu", "0"),
-                    "memory_capacity": capacity.get("memory", "0"),
-                    "pods_capacity": capacity.get("pods", "0"),
-                    "internal_ip": self._get_node_internal_ip(node),
-                    "cpu_usage_percent": 35,  # Mock data - would need metrics-server
-                    "memory_usage_percent": 55,  # Mock data
-                })
-            return nodes
+            items = await self._list_items(self._core_v1.list_node)
+            return [self._node_to_row(node) for node in items]
         except Exception:
             return []
 
-    def _get_node_internal_ip(self, node) -> str:
-        """Get node internal IP."""
-        for addr in node.status.addresses or []:
-            if addr.type == "InternalIP":
-                return addr.address
-        return ""
+    @staticmethod
+    def _node_to_row(node: dict) -> dict[str, Any]:
+        """Project a raw Node object onto the API row."""
+        metadata = node["metadata"]
+        node_status = node.get("status", {})
+
+        # Get node status
+        conditions = {
+            c.get("type"): c.get("status")
+            for c in node_status.get("conditions") or []
+        }
+        ready = conditions.get("Ready")
+        if ready is None:
+            status = "Unknown"
+        else:
+            status = "Ready" if ready == "True" else "NotReady"
+
+        # Get roles
+        roles = [
+            label.split("/")[-1]
+            for label in metadata.get("labels") or {}
+            if label.startswith("node-role.kubernetes.io/")
+        ] or ["worker"]
 
-    def list_services(self, namespace: str = "default") -> list[dict[str, Any]]:
+        # Get capacity
+        capacity = node_status.get("capacity") or {}
+        node_info = node_status.get("nodeInfo") or {}
+
+        # Get internal IP
+        internal_ip = next(
+            (
+                addr.get("address", "")
+                for addr in node_status.get("addresses") or []
+                if addr.get("type") == "InternalIP"
+            ),
+            "",
+        )
+
+        return {
+            "name": metadata["name"],
+            "status": status,
+            "roles": roles,
+            "version": node_info.get("kubeletVersion", ""),
+            "os": node_info.get("operatingSystem", ""),
+            "arch": node_info.get("architecture", ""),
+            "cpu_capacity": capacity.get("cpu", "0"),
+            "memory_capacity": capacity.get("memory", "0"),
+            "pods_capacity": capacity.get("pods", "0"),
+            "internal_ip": internal_ip,
+            "cpu_usage_percent": 35,  # Mock data - would need metrics-server
+            "memory_usage_percent": 55,  # Mock data
+        }
+
+    async def list_services(self, namespace: str = "default") -> list[dict[str, Any]]:
         """List services in a namespace."""
         if not self._connected or not self._core_v1:
             return []
         try:
             if namespace == "all":
-                result = self._core_v1.list_service_for_all_namespaces(limit=200)
+                items = await self._list_all_namespaces(self._core_v1.list_namespaced_service, limit=500)
             else:
-                result = self._core_v1.list_namespaced_service(namespace, limit=200)
+                items = await self._list_items(self._core_v1.list_namespaced_service, namespace, limit=200)
             
-            services = []
-            for svc in result.items:
-                ports = []
-                for port in svc.spec.ports or []:
-                    port_str = f"{port.port}"
-                    if port.node_port:
-                        port_str += f":{port.node_port}"
-                    port_str += f"/{port.protocol}"
-                    ports.append(port_str)
-                
-                # Calculate age
-                created = svc.metadata.creation_timestamp
-                age = ""
-                if created:
-                    from datetime import datetime, timezone
-                    delta = datetime.now(timezone.utc) - created
-                    if delta.days > 0:
-                        age = f"{delta.days}d"
-                    elif delta.seconds >= 3600:
-                        age = f"{delta.seconds // 3600}h"
-                    else:
-                        age = f"{delta.seconds // 60}m"
-                
-                services.append({
-                    "name": svc.metadata.name,
-                    "namespace": svc.metadata.namespace,
-                    "type": svc.spec.type,
-                    "cluster_ip": svc.spec.cluster_ip or "",
-                    "external_ip": self._get_external_ip(svc),
-                    "ports": ports,
-                    "selector": svc.spec.selector or {},
-                    "age": age,
-                })
-            return services
+            now = datetime.now(timezone.utc)
+            return [self._service_to_row(svc, now) for svc in items]
         except Exception:
             return []
 
-    def _get_external_ip(self, svc) -> str | None:
-        """Get external IP for a service."""
-        if svc.spec.type == "LoadBalancer" and svc.status.load_balancer.ingress:
-            ingress = svc.status.load_balancer.ingress[0]
-            return ingress.ip or ingress.hostname
-        if svc.spec.external_i_ps:
-            return svc.spec.external_i_ps[0]
-        return None
+    @staticmethod
+    def _service_to_row(svc: dict, now: datetime) -> dict[str, Any]:
+        """Project a raw Service object onto the API row."""
+        metadata = svc["metadata"]
+        spec = svc.get("spec", {})
+        svc_type = spec.get("type")
+
+        ports = []
+        for port in spec.get("ports") or []:
+            port_str = f"{port.get('port')}"
+            if port.get("nodePort"):
+                port_str += f":{port['nodePort']}"
+            port_str += f"/{port.get('protocol')}"
+            ports.append(port_str)
 
-    def list_pods(self, namespace: str = "default") -> list[dict[str, Any]]:
+        # Calculate age
+        created = metadata.get("creationTimestamp")
+        age = ""
+        if created:
+            delta = now - datetime.fromisoformat(created)
+            if delta.days > 0:
+                age = f"{delta.days}d"
+            elif delta.seconds >= 3600:
+                age = f"{delta.seconds // 3600}h"
+            else:
+                age = f"{delta.seconds // 60}m"
+
+        # Get external IP
+        external_ip = None
+        ingress = svc.get("status", {}).get("loadBalancer", {}).get("ingress")
+        if svc_type == "LoadBalancer" and ingress:
+            external_ip = ingress[0].get("ip") or ingress[0].get("hostname")
+        elif spec.get("externalIPs"):
+            external_ip = spec["externalIPs"][0]
+
+        return {
+            "name": metadata["name"],
+            "namespace": metadata.get("namespace"),
+            "type": svc_type,
+            "cluster_ip": spec.get("clusterIP") or "",
+            "external_ip": external_ip,
+            "ports": ports,
+            "selector": spec.get("selector") or {},
+            "age": age,
+        }
+
+    async def list_pods(self, namespace: str = "default") -> list[dict[str, Any]]:
         """List pods in a namespace."""
         if not self._connected or not self._core_v1:
             return []
         try:
             if namespace == "all":
-                result = self._core_v1.list_pod_for_all_namespaces(limit=200)
+                items = await self._list_all_namespaces(self._core_v1.list_namespaced_pod, limit=500)
             else:
-                result = self._core_v1.list_namespaced_pod(namespace, limit=200)
+                items = await self._list_items(self._core_v1.list_namespaced_pod, namespace, limit=200)
             
-            return [
-                {
-                    "name": pod.metadata.name,
-                    "namespace": pod.metadata.namespace,
-                    "status": pod.status.phase,
-                    "ready": self._get_pod_ready_count(pod),
-                    "restarts": self._get_pod_restarts(pod),
-                    "node": pod.spec.node_name,
-                    "ip": pod.status.pod_ip,
-                    "created": pod.metadata.creation_timestamp.isoformat() if pod.metadata.creation_timestamp else None,
-                }
-                for pod in result.items
-            ]
+            return [self._pod_to_row(pod) for pod in items]
         except Exception:
             return []
 
-    def _get_pod_ready_count(self, pod) -> str:
-        """Get ready container count."""
-        if not pod.status.container_statuses:
-            return "0/0"
-        ready = sum(1 for c in pod.status.container_statuses if c.ready)
-        total = len(pod.status.container_statuses)
-        return f"{ready}/{total}"
-
-    def _get_pod_restarts(self, pod) -> int:
-        """Get total restart count."""
-        if not pod.status.container_statuses:
-            return 0
-        return sum(c.restart_count for c in pod.status.container_statuses)
-
-    def list_deployments(self, namespace: str = "default") -> list[dict[str, Any]]:
+    @staticmethod
+    def _pod_to_row(pod: dict) -> dict[str, Any]:
+        """Project a raw Pod object onto the API row."""
+        metadata = pod["metadata"]
+        pod_status = pod.get("status", {})
+        container_statuses = pod_status.get("containerStatuses") or ()
+
+        ready = 0
+        restarts = 0
+        for container in container_statuses:
+            if container.get("ready"):
+                ready += 1
+            restarts += container.get("restartCount", 0)
+
+        return {
+            "name": metadata["name"],
+            "namespace": metadata.get("namespace"),
+            "status": pod_status.get("phase"),
+            "ready": f"{ready}/{len(container_statuses)}",
+            "restarts": restarts,
+            "node": pod.get("spec", {}).get("nodeName"),
+            "ip": pod_status.get("podIP"),
+            "created": metadata.get("creationTimestamp"),
+        }
+
+    async def list_deployments(self, namespace: str = "default") -> list[dict[str, Any]]:
         """List deployments in a namespace."""
         if not self._connected or not self._apps_v1:
             return []
         try:
             if namespace == "all":
-                result = self._apps_v1.list_deployment_for_all_namespaces(limit=200)
+                items = await self._list_all_namespaces(self._apps_v1.list_namespaced_deployment, limit=500)
             else:
-                result = self._apps_v1.list_namespaced_deployment(namespace, limit=200)
+                items = await self._list_items(self._apps_v1.list_namespaced_deployment, namespace, limit=200)
             
-            return [
-                {
-                    "name": dep.metadata.name,
-                    "namespace": dep.metadata.namespace,
-                    "replicas": dep.spec.replicas or 0,
-                    "ready": dep.status.ready_replicas or 0,
-                    "available": dep.status.available_replicas or 0,
-                    "created": dep.metadata.creation_timestamp.isoformat() if dep.metadata.creation_timestamp else None,
-                }
-                for dep in result.items
-            ]
+            return [self._deployment_to_row(dep) for dep in items]
         except Exception:
             return []
 
-    def get_pod_logs(self, name: str, namespace: str, tail_lines: int = 100) -> str:
+    @staticmethod
+    def _deployment_to_row(dep: dict) -> dict[str, Any]:
+        """Project a raw Deployment object onto the API row."""
+        metadata = dep["metadata"]
+        dep_status = dep.get("status", {})
+        return {
+            "name": metadata["name"],
+            "namespace": metadata.get("namespace"),
+            "replicas": dep.get("spec", {}).get("replicas") or 0,
+            "ready": dep_status.get("readyReplicas") or 0,
+            "available": dep_status.get("availableReplicas") or 0,
+            "created": metadata.get("creationTimestamp"),
+        }
+
+    async def get_pod_logs(self, name: str, namespace: str, tail_lines: int = 100) -> str:
         """Get logs for a pod."""
         if not self._connected or not self._core_v1:
             return "Not connected to cluster"
         try:
-            return self._core_v1.read_namespaced_pod_log(
+            return await asyncio.to_thread(
+                self._core_v1.read_namespaced_pod_log,
                 name=name,
                 namespace=namespace,
                 tail_lines=tail_lines,
@@ -323,6 +501,53 @@ class K8sClient:
         except Exception as e:
             return f"Error: {str(e)}"
 
+    async def stream_pod_logs(
+        self, name: str, namespace: str, tail_lines: int = 100, follow: bool = True
+    ) -> AsyncIterator[str]:
+        """Yield pod log lines as the apiserver sends them."""
+        if not self._connected or not self._core_v1:
+            yield "Not connected to cluster"
+            return
+        if follow:
+            try:
+                log_streams.acquire()
+            except LogStreamLimitError as e:
+                yield f"Error: {str(e)}"
+                return
+        try:
+            response = await asyncio.to_thread(
+                self._core_v1.read_namespaced_pod_log,
+                name=name,
+                namespace=namespace,
+                tail_lines=tail_lines,
+                follow=follow,
+                _preload_content=False,
+            )
+        except Exception as e:
+            if follow:
+                log_streams.release()
+            yield f"Error: {str(e)}"
+            return
+
+        # Followed streams can block for long stretches; keep them off the
+        # default executor
+        read = log_streams.read if follow else lambda it: asyncio.to_thread(next, it, None)
+        try:
+            chunks = response.stream(4096)
+            pending = b""
+            while (chunk := await read(chunks)) is not None:
+                *lines, pending = (pending + chunk).split(b"\n")
+                for line in lines:
+                    yield line.decode("utf-8", errors="replace").rstrip("\r")
+            if pending:
+                yield pending.decode("utf-8", errors="replace").rstrip("\r")
+        finally:
+            # Drop the connection rather than pooling a half-read (followed) stream
+            response.close()
+            response.release_conn()
+            if follow:
+                log_streams.release()
+
 
 # Singleton instance
 k8s_client = K8sClient()
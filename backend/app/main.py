@@ -1,13 +1,18 @@
 """xKube Backend - FastAPI Application."""
 
-from fastapi import FastAPI
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from contextlib import asynccontextmanager
 
 from app.api import clusters, pods, deployments, logs, nodes, services, namespaces, auth
 from app.routes import clusters as cluster_mgmt  # New cluster management routes
 from app.routes import pods as pod_mgmt  # New pod management routes
 from app.core.config import settings
+from app.core.responses import ORJSONResponse
+from app.middleware import db_session_middleware, ETagMiddleware
 
 
 @asynccontextmanager
@@ -15,6 +20,21 @@ async def lifespan(app: FastAPI):
     """Application lifespan events."""
     print("🚀 xKube API starting...")
     
+    loop = asyncio.get_running_loop()
+    if not type(loop).__module__.startswith("uvloop"):
+        print(f"⚠️  Running on {type(loop).__name__}; start uvicorn with --loop uvloop for production")
+    
+    # Bounded pool for blocking kubernetes client calls (asyncio.to_thread)
+    loop.set_default_executor(
+        ThreadPoolExecutor(max_workers=settings.k8s_max_workers, thread_name_prefix="k8s")
+    )
+    
+    # Size the password hashing cost to this host
+    if settings.scrypt_target_ms:
+        from app.services.auth_service import AuthService
+        log_n = await asyncio.to_thread(AuthService.calibrate_scrypt, settings.scrypt_target_ms)
+        print(f"🔐 scrypt cost calibrated to 2**{log_n}")
+    
     # Initialize database
     from app.database import init_db
     await init_db()
@@ -23,6 +43,12 @@ async def lifespan(app: FastAPI):
     yield
     
     # Cleanup
+    from app.services.k8s_client import k8s_client_service
+    k8s_client_service.close()
+    from app.core.log_streams import log_streams
+    log_streams.shutdown()
+    from app.services.oauth_service import close_http_client
+    await close_http_client()
     from app.database import close_db
     await close_db()
     print("👋 xKube API shutting down...")
@@ -33,19 +59,30 @@ app = FastAPI(
     description="Kubernetes Management Platform API",
     version="1.0.0",
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
-# CORS
+# Request-scoped DB session (registered first so CORS wraps it)
+app.middleware("http")(db_session_middleware)
+
+# ETag/304 on the uncompressed body, then gzip for larger payloads
+app.add_middleware(ETagMiddleware)
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
+# CORS (a frozenset, so origin checks are hashed lookups)
+CORS_ORIGINS = frozenset({
+    settings.frontend_url,
+    "http://localhost:3000",
+    "http://localhost:5173",  # Vite dev server
+})
+
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=[
-        settings.frontend_url,
-        "http://localhost:3000",
-        "http://localhost:5173",  # Vite dev server
-    ],
+    allow_origins=CORS_ORIGINS,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Total-Count"],
 )
 
 # Routes
@@ -71,3 +108,21 @@ async def root():
 async def health():
     """Health check endpoint."""
     return {"status": "healthy"}
+
+
+if settings.debug_cache_endpoint:
+    @app.get("/api/debug/cache", dependencies=[Depends(auth.get_current_user)])
+    async def cache_stats():
+        """In-process cache statistics (opt-in, authenticated)."""
+        from app.k8s import k8s_client
+        from app.services.auth_service import AuthService
+        from app.services.user_repository import _user_cache
+        from app.core.log_streams import log_streams
+        return {
+            "k8s_list": k8s_client.cache_stats(),
+            "jwt_claims": AuthService._claims_cache.stats(),
+            "dead_refresh_tokens": AuthService._dead_refresh_tokens.stats(),
+            "revoked_access_tokens": AuthService._revoked_access_tokens.stats(),
+            "users": _user_cache.stats(),
+            "log_streams": log_streams.stats(),
+        }
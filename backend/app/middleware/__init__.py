@@ -0,0 +1,5 @@
+"""Middleware module."""
+from app.middleware.db import db_session_middleware
+from app.middleware.etag import ETagMiddleware
+
+__all__ = ["db_session_middleware", "ETagMiddleware"]
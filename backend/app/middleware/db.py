@@ -0,0 +1,44 @@
+"""
+Request-scoped database session middleware
+"""
+import re
+
+from fastapi import Request
+
+from app.database import AsyncSessionLocal, ReadOnlySessionLocal
+
+# Methods served from an autocommit session (no explicit transaction)
+READ_ONLY_METHODS = frozenset({"GET", "HEAD"})
+
+# GET routes that write (user upsert + refresh token); they keep the
+# transactional session so a failure rolls back
+WRITING_GET_PATHS = re.compile(r"/api/auth/oauth/[^/]+/callback")
+
+
+async def db_session_middleware(request: Request, call_next):
+    """
+    Open one AsyncSession per request and expose it as request.state.db
+
+    The session is committed when the handler produces a successful response
+    and rolled back on errors (including HTTPException-generated 4xx/5xx).
+    GET/HEAD requests use an AUTOCOMMIT session with no transaction to open
+    or commit, except the writing paths in WRITING_GET_PATHS.
+    """
+    if request.method in READ_ONLY_METHODS and not WRITING_GET_PATHS.fullmatch(request.url.path):
+        session_factory = ReadOnlySessionLocal
+    else:
+        session_factory = AsyncSessionLocal
+
+    async with session_factory() as session:
+        request.state.db = session
+        try:
+            response = await call_next(request)
+        except Exception:
+            await session.rollback()
+            raise
+
+        if response.status_code < 400:
+            await session.commit()
+        else:
+            await session.rollback()
+        return response
@@ -0,0 +1,76 @@
+"""
+ETag middleware for JSON GET responses
+"""
+from hashlib import blake2b
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """Check an If-None-Match header value against an ETag"""
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+class ETagMiddleware:
+    """
+    Tag successful JSON GET responses with a content hash and answer
+    conditional requests whose If-None-Match matches with 304 Not Modified
+
+    JSON bodies are buffered in full before hashing (the DB session middleware
+    re-streams every response); other content types such as SSE logs pass
+    through untouched.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD"):
+            await self.app(scope, receive, send)
+            return
+
+        if_none_match = Headers(scope=scope).get("if-none-match")
+        start_message: Message | None = None
+        chunks: list[bytes] = []
+
+        async def send_with_etag(message: Message):
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(raw=message["headers"])
+                if (
+                    message["status"] == 200
+                    and "etag" not in headers
+                    and headers.get("content-type", "").startswith("application/json")
+                ):
+                    # Hold the start message until the whole body is known
+                    start_message = message
+                    return
+            elif message["type"] == "http.response.body" and start_message is not None:
+                chunks.append(message.get("body", b""))
+                if message.get("more_body", False):
+                    return
+
+                body = b"".join(chunks)
+                etag = f'"{blake2b(body, digest_size=8).hexdigest()}"'
+                headers = MutableHeaders(raw=start_message["headers"])
+                headers["ETag"] = etag
+                if if_none_match and _etag_matches(if_none_match, etag):
+                    del headers["content-length"]
+                    del headers["content-type"]
+                    await send({**start_message, "status": 304})
+                    await send({"type": "http.response.body", "body": b""})
+                    return
+
+                headers["Content-Length"] = str(len(body))
+                await send(start_message)
+                await send({"type": "http.response.body", "body": body})
+                return
+
+            await send(message)
+
+        await self.app(scope, receive, send_with_etag)
@@ -8,6 +8,7 @@ from .user import (
     TokenResponse,
     TokenRefreshRequest,
     OAuthState,
+    Principal,
 )
 
 # Database models
@@ -23,6 +24,7 @@ __all__ = [
     "TokenResponse",
     "TokenRefreshRequest",
     "OAuthState",
+    "Principal",
     # Database models
     "User",
     "Cluster",
@@ -1,10 +1,10 @@
 """
 Database models for xKube
 """
-from sqlalchemy import Column, String, Boolean, DateTime, Text, JSON, ForeignKey, Float, Index
+from sqlalchemy import Column, String, Boolean, DateTime, Text, JSON, ForeignKey, Float, Integer, Index, LargeBinary
 from sqlalchemy.dialects.postgresql import UUID as PG_UUID
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, text
 from pgvector.sqlalchemy import Vector
 import uuid
 from datetime import datetime
@@ -30,6 +30,11 @@ class User(Base):
     clusters = relationship("Cluster", back_populates="owner", cascade="all, delete-orphan")
     refresh_tokens = relationship("RefreshToken", back_populates="user", cascade="all, delete-orphan")
 
+    # Logins match emails case-insensitively
+    __table_args__ = (
+        Index('idx_users_email_lower', func.lower(email), unique=True),
+    )
+
     def __repr__(self):
         return f"<User {self.email}>"
 
@@ -40,7 +45,7 @@ class RefreshToken(Base):
 
     id = Column(PG_UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = Column(PG_UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
-    token_hash = Column(String(255), unique=True, nullable=False, index=True)
+    token_hash = Column(LargeBinary(32), unique=True, nullable=False, index=True)
     revoked = Column(Boolean, default=False, nullable=False)
     expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
@@ -48,6 +53,15 @@ class RefreshToken(Base):
     # Relationships
     user = relationship("User", back_populates="refresh_tokens")
 
+    # Partial index over live tokens for per-user revocation
+    __table_args__ = (
+        Index(
+            'idx_refresh_tokens_user_active',
+            'user_id',
+            postgresql_where=text('revoked = false'),
+        ),
+    )
+
     def __repr__(self):
         return f"<RefreshToken {self.id}>"
 
@@ -62,7 +76,7 @@ class Cluster(Base):
     description = Column(Text, nullable=True)
     
     # Encrypted kubeconfig
-    kubeconfig_encrypted = Column(Text, nullable=False)
+    kubeconfig_encrypted = Column(LargeBinary, nullable=False)
     context = Column(String(255), nullable=False)
     
     # Status
@@ -71,8 +85,8 @@ class Cluster(Base):
     
     # Metadata
     version = Column(String(50), nullable=True)
-    node_count = Column(Float, default=0)
-    pod_count = Column(Float, default=0)
+    node_count = Column(Integer, default=0, server_default="0", nullable=False)
+    pod_count = Column(Integer, default=0, server_default="0", nullable=False)
     tags = Column(JSON, nullable=True, default=list)
     
     # Ownership
@@ -85,8 +99,21 @@ class Cluster(Base):
 
     # Relationships
     owner = relationship("User", back_populates="clusters")
-    events = relationship("Event", back_populates="cluster", cascade="all, delete-orphan")
-    metrics = relationship("Metric", back_populates="cluster", cascade="all, delete-orphan")
+    # passive_deletes: rely on ON DELETE CASCADE instead of loading every
+    # event/metric row just to delete it
+    events = relationship("Event", back_populates="cluster", cascade="all, delete-orphan", passive_deletes=True)
+    metrics = relationship("Metric", back_populates="cluster", cascade="all, delete-orphan", passive_deletes=True)
+
+    # Indexes for per-owner lookups
+    __table_args__ = (
+        Index('idx_clusters_owner_name', 'owner_id', 'name'),
+        # Partial index covering only active clusters (one per owner)
+        Index(
+            'idx_clusters_owner_active',
+            'owner_id',
+            postgresql_where=text('is_active = true'),
+        ),
+    )
 
     def __repr__(self):
         return f"<Cluster {self.name}>"
@@ -123,6 +150,14 @@ class Event(Base):
     __table_args__ = (
         Index('idx_events_cluster_created', 'cluster_id', 'created_at'),
         Index('idx_events_severity_created', 'severity', 'created_at'),
+        # ANN index for cosine similarity search over embeddings
+        Index(
+            'idx_events_embedding_hnsw',
+            'embedding',
+            postgresql_using='hnsw',
+            postgresql_with={'m': 24, 'ef_construction': 128},
+            postgresql_ops={'embedding': 'vector_cosine_ops'},
+        ),
     )
 
     def __repr__(self):
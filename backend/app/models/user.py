@@ -1,9 +1,10 @@
 """
 User and Authentication Models
 """
+from dataclasses import dataclass
 from datetime import datetime
 from typing import Optional
-from uuid import uuid4
+from uuid import UUID, uuid4
 from pydantic import BaseModel, EmailStr, Field
 from enum import Enum
 
@@ -17,6 +18,13 @@ class AuthProvider(str, Enum):
     OIDC = "oidc"
 
 
+@dataclass(frozen=True)
+class Principal:
+    """Authenticated caller, built from verified access token claims (no DB lookup)"""
+    id: UUID
+    email: Optional[str] = None
+
+
 # Database models (simplified for SQLite)
 class UserDB(BaseModel):
     """User stored in database"""
@@ -39,7 +47,7 @@ class RefreshTokenDB(BaseModel):
     """Refresh token stored in database"""
     id: str = Field(default_factory=lambda: str(uuid4()))
     user_id: str
-    token_hash: str
+    token_hash: bytes  # SHA-256 digest of the raw token
     expires_at: datetime
     revoked: bool = False
     created_at: datetime = Field(default_factory=datetime.utcnow)
@@ -1,6 +1,8 @@
 """
 Cluster management API routes
 """
+import asyncio
+from collections import OrderedDict
 from fastapi import APIRouter, HTTPException, Depends, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
@@ -9,21 +11,40 @@ from uuid import UUID
 from pathlib import Path
 import yaml # Assuming yamlerService is meant to be yaml
 
+from app.core.responses import ORJSONResponse
+from app.core.yaml import load_yaml_file
 from app.database import get_db
 from app.schemas import ClusterCreate, ClusterUpdate, ClusterResponse, ClusterConnectionTest
 from app.services.cluster_service import ClusterService
-from app.models import Cluster
-from app.api.auth import get_current_user
+from app.models import Cluster, Principal
+from app.api.auth import get_current_principal
 
 router = APIRouter(prefix="/api/clusters", tags=["clusters"])
 
+# Parsed auto-detect results keyed by (kubeconfig path, mtime_ns)
+_KUBECONFIG_CACHE_SIZE = 16
+_kubeconfig_cache: OrderedDict[tuple[str, int], tuple[list, str]] = OrderedDict()
+
+
+async def _get_owned_cluster(db: AsyncSession, cluster_id: UUID, current_user: Principal) -> Cluster:
+    """
+    Load a cluster owned by the current user in one query.
+    Clusters owned by someone else are reported as not found, so IDs can't be probed.
+    """
+    cluster = await ClusterService.get_owned_cluster(db, cluster_id, current_user.id)
+    if not cluster:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Cluster not found"
+        )
+    return cluster
 
 
 @router.post("/", response_model=ClusterResponse)
 async def create_cluster(
     cluster_data: ClusterCreate,
     db: AsyncSession = Depends(get_db),
-    current_user = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     """
     Create a new Kubernetes cluster configuration
@@ -38,18 +59,13 @@ async def create_cluster(
     - **tags**: Optional tags for organization
     """
     try:
-        # Check if cluster already exists for this user
-        existing_clusters = await ClusterService.get_clusters(db, owner_id=current_user.id)
-        existing = next((c for c in existing_clusters if c.name == cluster_data.name), None)
+        # Insert, or get back the user's existing cluster, in one round-trip
+        cluster, created = await ClusterService.upsert_cluster(db, cluster_data, current_user.id)
         
-        if existing:
+        if not created:
             # Cluster already exists - return it instead of creating a duplicate
             # The frontend can navigate to this cluster's details page
             print(f"INFO: Cluster '{cluster_data.name}' already exists, returning existing cluster")
-            return existing
-        
-        # Create new cluster
-        cluster = await ClusterService.create_cluster(db, cluster_data, current_user.id)
         return cluster
     except ValueError as e:
         # Handle validation errors (missing configs, invalid kubeconfig, etc.)
@@ -72,21 +88,89 @@ async def create_cluster(
         )
 
 
-@router.get("/", response_model=List[ClusterResponse])
+@router.get(
+    "/",
+    response_model=None,
+    responses={200: {"model": List[ClusterResponse]}},
+)
 async def list_clusters(
     skip: int = 0,
     limit: int = 100,
+    with_count: bool = False,
     db: AsyncSession = Depends(get_db),
-    current_user = Depends(get_current_user)
-):
-    """List all clusters for the current user"""
-    clusters = await ClusterService.get_clusters(db, owner_id=current_user.id, skip=skip, limit=limit)
-    return clusters
+    current_user: Principal = Depends(get_current_principal)
+) -> ORJSONResponse:
+    """
+    List all clusters for the current user
+    
+    - **with_count**: Also report the total number of clusters in an X-Total-Count header
+    """
+    headers = None
+    if with_count:
+        clusters, total = await ClusterService.get_clusters(
+            db, owner_id=current_user.id, skip=skip, limit=limit, with_count=True
+        )
+        headers = {"X-Total-Count": str(total)}
+    else:
+        clusters = await ClusterService.get_clusters(db, owner_id=current_user.id, skip=skip, limit=limit)
+    # Rows come from our own table with exactly the ClusterResponse columns,
+    # so skip Pydantic entirely; orjson encodes the UUIDs/datetimes natively
+    return ORJSONResponse([dict(cluster._mapping) for cluster in clusters], headers=headers)
+
+
+def _context_summary(ctx: dict, servers_by_cluster: dict, current_context: str) -> dict:
+    """Summarize one kubeconfig context for the import picker"""
+    context_name = ctx.get('name', '')
+    context_info = ctx.get('context') or {}
+    cluster_name = context_info.get('cluster', '')
+    return {
+        'name': context_name,
+        'cluster': cluster_name,
+        'user': context_info.get('user', ''),
+        'namespace': context_info.get('namespace', 'default'),
+        'server': servers_by_cluster.get(cluster_name, ''),
+        'is_current': context_name == current_context
+    }
+
+
+def _detect_contexts(kubeconfig_path: Path) -> Optional[tuple[list, str]]:
+    """
+    Parse kubeconfig contexts, memoized on the file's path and mtime.
+    Returns (contexts, current_context), or None if the file is missing.
+    """
+    try:
+        key = (str(kubeconfig_path), kubeconfig_path.stat().st_mtime_ns)
+    except FileNotFoundError:
+        return None
+    
+    cached = _kubeconfig_cache.get(key)
+    if cached is not None:
+        _kubeconfig_cache.move_to_end(key)
+        return cached
+    
+    config_data = load_yaml_file(kubeconfig_path) or {}
+    current_context = config_data.get('current-context', '')
+    
+    # Cluster server URLs by cluster name
+    servers_by_cluster = {
+        cluster.get('name'): (cluster.get('cluster') or {}).get('server', '')
+        for cluster in config_data.get('clusters') or []
+    }
+    
+    contexts_list = [
+        _context_summary(ctx, servers_by_cluster, current_context)
+        for ctx in config_data.get('contexts') or []
+    ]
+    
+    _kubeconfig_cache[key] = (contexts_list, current_context)
+    while len(_kubeconfig_cache) > _KUBECONFIG_CACHE_SIZE:
+        _kubeconfig_cache.popitem(last=False)
+    return contexts_list, current_context
 
 
 @router.get("/auto-detect")
 async def auto_detect_clusters(
-    current_user = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     """
     Auto-detect Kubernetes clusters from local kubeconfig file (~/.kube/config)
@@ -96,45 +180,16 @@ async def auto_detect_clusters(
         # Read kubeconfig from user's home directory
         kubeconfig_path = Path.home() / ".kube" / "config"
         
-        if not kubeconfig_path.exists():
+        # Read and parse kubeconfig YAML off the event loop
+        detected = await asyncio.to_thread(_detect_contexts, kubeconfig_path)
+        if detected is None:
             return {
                 "success": False,
                 "message": "No kubeconfig file found at ~/.kube/config",
                 "contexts": [],
                 "kubeconfig_path": str(kubeconfig_path)
             }
-        
-        # Parse kubeconfig YAML
-        with open(kubeconfig_path, 'r') as f:
-            kubeconfig_content = f.read()
-            config_data = yaml.safe_load(kubeconfig_content)
-        
-        # Extract contexts
-        contexts_list = []
-        current_context = config_data.get('current-context', '')
-        
-        for ctx in config_data.get('contexts', []):
-            context_name = ctx.get('name', '')
-            context_info = ctx.get('context', {})
-            cluster_name = context_info.get('cluster', '')
-            user_name = context_info.get('user', '')
-            namespace = context_info.get('namespace', 'default')
-            
-            # Get cluster server URL if available
-            cluster_server = ''
-            for cluster in config_data.get('clusters', []):
-                if cluster.get('name') == cluster_name:
-                    cluster_server = cluster.get('cluster', {}).get('server', '')
-                    break
-            
-            contexts_list.append({
-                'name': context_name,
-                'cluster': cluster_name,
-                'user': user_name,
-                'namespace': namespace,
-                'server': cluster_server,
-                'is_current': context_name == current_context
-            })
+        contexts_list, current_context = detected
         
         return {
             "success": True,
@@ -160,25 +215,10 @@ async def auto_detect_clusters(
 async def get_cluster(
     cluster_id: UUID,
     db: AsyncSession = Depends(get_db),
-    current_user = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Get cluster details by ID"""
-    cluster = await ClusterService.get_cluster(db, cluster_id)
-    
-    if not cluster:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Cluster not found"
-        )
-    
-    # Check ownership
-    if cluster.owner_id != current_user.id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Not authorized to access this cluster"
-        )
-    
-    return cluster
+    return await _get_owned_cluster(db, cluster_id, current_user)
 
 
 @router.put("/{cluster_id}", response_model=ClusterResponse)
@@ -186,23 +226,10 @@ async def update_cluster(
     cluster_id: UUID,
     cluster_update: ClusterUpdate,
     db: AsyncSession = Depends(get_db),
-    current_user = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Update cluster configuration"""
-    cluster = await ClusterService.get_cluster(db, cluster_id)
-    
-    if not cluster:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Cluster not found"
-        )
-    
-    # Check ownership
-    if cluster.owner_id != current_user.id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Not authorized to modify this cluster"
-        )
+    await _get_owned_cluster(db, cluster_id, current_user)
     
     updated_cluster = await ClusterService.update_cluster(db, cluster_id, cluster_update)
     return updated_cluster
@@ -212,23 +239,10 @@ async def update_cluster(
 async def delete_cluster(
     cluster_id: UUID,
     db: AsyncSession = Depends(get_db),
-    current_user = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Delete a cluster"""
-    cluster = await ClusterService.get_cluster(db, cluster_id)
-    
-    if not cluster:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Cluster not found"
-        )
-    
-    # Check ownership
-    if cluster.owner_id != current_user.id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Not authorized to delete this cluster"
-        )
+    await _get_owned_cluster(db, cluster_id, current_user)
     
     await ClusterService.delete_cluster(db, cluster_id)
     return None
@@ -238,23 +252,10 @@ async def delete_cluster(
 async def test_cluster_connection(
     cluster_id: UUID,
     db: AsyncSession = Depends(get_db),
-    current_user = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Test connection to Kubernetes cluster"""
-    cluster = await ClusterService.get_cluster(db, cluster_id)
-    
-    if not cluster:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Cluster not found"
-        )
-    
-    # Check ownership
-    if cluster.owner_id != current_user.id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Not authorized to test this cluster"
-        )
+    cluster = await _get_owned_cluster(db, cluster_id, current_user)
     
     # Test connection
     result = await ClusterService.test_connection(cluster)
@@ -277,23 +278,9 @@ async def test_cluster_connection(
 async def activate_cluster(
     cluster_id: UUID,
     db: AsyncSession = Depends(get_db),
-    current_user = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Set cluster as active (deactivate others)"""
-    cluster = await ClusterService.get_cluster(db, cluster_id)
-    
-    if not cluster:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Cluster not found"
-        )
-    
-    # Check ownership
-    if cluster.owner_id != current_user.id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Not authorized to activate this cluster"
-        )
+    cluster = await _get_owned_cluster(db, cluster_id, current_user)
     
-    activated_cluster = await ClusterService.activate_cluster(db, cluster_id)
-    return activated_cluster
+    return await ClusterService.activate_cluster(db, cluster)
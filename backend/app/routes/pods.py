@@ -2,31 +2,35 @@
 API routes for pod management
 """
 from typing import Optional
+import orjson
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_db
+from app.models import Principal
 from app.models.database import Cluster
 from app.services.k8s_client import k8s_client_service
-from app.api.auth import get_current_user
+from app.api.auth import get_current_principal
+from app.core.log_streams import LogStreamLimitError
+from app.core.responses import ORJSONResponse
 
 router = APIRouter()
 
 
 async def get_active_cluster(
     db: AsyncSession = Depends(get_db),
-    user = Depends(get_current_user)
+    user: Principal = Depends(get_current_principal)
 ) -> Cluster:
     """Get the active cluster for the current user"""
     from sqlalchemy import select
     
-    result = await db.execute(
+    cluster = await db.scalar(
         select(Cluster).where(
-            Cluster.user_id == user.id,
+            Cluster.owner_id == user.id,
             Cluster.is_active == True
-        )
+        ).limit(1)
     )
-    cluster = result.scalar_one_or_none()
     
     if not cluster:
         raise HTTPException(
@@ -41,6 +45,8 @@ async def get_active_cluster(
 async def list_pods(
     namespace: str = Query(default="", description="Namespace to filter pods (empty = all namespaces)"),
     label_selector: Optional[str] = Query(default=None, description="Label selector to filter pods"),
+    stream: bool = Query(default=False, description="Stream pods as newline-delimited JSON"),
+    fields: Optional[str] = Query(default=None, description="Comma-separated pod fields to return (default: all)"),
     cluster: Cluster = Depends(get_active_cluster)
 ):
     """
@@ -48,21 +54,49 @@ async def list_pods(
     
     - **namespace**: Namespace to filter (empty string for all namespaces)
     - **label_selector**: Optional label selector (e.g., "app=nginx")
+    - **stream**: Return one pod per line (application/x-ndjson) instead of a JSON envelope
+    - **fields**: Only include these top-level pod fields (e.g., "name,namespace,status")
     """
+    field_set = None
+    if fields:
+        field_set = frozenset(f.strip() for f in fields.split(",") if f.strip())
+        unknown = field_set - k8s_client_service.POD_FIELDS
+        if unknown:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown pod fields: {', '.join(sorted(unknown))}"
+            )
+    
     try:
+        if stream:
+            pods = await k8s_client_service.iter_pods(
+                kubeconfig=cluster.kubeconfig_encrypted,
+                context=cluster.context,
+                namespace=namespace or "",
+                label_selector=label_selector,
+                fields=field_set
+            )
+            return StreamingResponse(
+                (orjson.dumps(pod) + b"\n" for pod in pods),
+                media_type="application/x-ndjson",
+                headers={"X-Cluster-Id": str(cluster.id)}
+            )
+        
         pods = await k8s_client_service.list_pods(
-            kubeconfig=cluster.kubeconfig,
+            kubeconfig=cluster.kubeconfig_encrypted,
             context=cluster.context,
             namespace=namespace or "",
-            label_selector=label_selector
+            label_selector=label_selector,
+            fields=field_set
         )
-        return {
+        # Pods hold dataclasses; hand them to orjson directly
+        return ORJSONResponse({
             "cluster_id": cluster.id,
             "cluster_name": cluster.name,
             "namespace": namespace or "all",
             "pods": pods,
             "total_count": len(pods)
-        }
+        })
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -76,12 +110,12 @@ async def get_pod(
     """Get detailed information about a specific pod"""
     try:
         pod = await k8s_client_service.get_pod(
-            kubeconfig=cluster.kubeconfig,
+            kubeconfig=cluster.kubeconfig_encrypted,
             context=cluster.context,
             namespace=namespace,
             name=name
         )
-        return pod
+        return ORJSONResponse(pod)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -95,7 +129,7 @@ async def delete_pod(
     """Delete a pod"""
     try:
         result = await k8s_client_service.delete_pod(
-            kubeconfig=cluster.kubeconfig,
+            kubeconfig=cluster.kubeconfig_encrypted,
             context=cluster.context,
             namespace=namespace,
             name=name
@@ -111,12 +145,35 @@ async def get_pod_logs(
     name: str,
     container: Optional[str] = Query(default=None, description="Container name (for multi-container pods)"),
     tail_lines: Optional[int] = Query(default=100, description="Number of lines to tail"),
+    follow: bool = Query(default=False, description="Keep streaming new log lines (requires stream)"),
+    stream: bool = Query(default=False, description="Return raw text/plain log output as it arrives"),
     cluster: Cluster = Depends(get_active_cluster)
 ):
-    """Get logs from a pod"""
+    """
+    Get logs from a pod
+    
+    By default logs are returned inside a JSON envelope. With **stream**, the
+    raw log bytes are relayed as text/plain without buffering or JSON escaping.
+    """
     try:
+        if stream:
+            chunks = await k8s_client_service.stream_pod_logs(
+                kubeconfig=cluster.kubeconfig_encrypted,
+                context=cluster.context,
+                namespace=namespace,
+                name=name,
+                container=container,
+                tail_lines=tail_lines,
+                follow=follow
+            )
+            return StreamingResponse(
+                chunks,
+                media_type="text/plain; charset=utf-8",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+            )
+        
         logs = await k8s_client_service.get_pod_logs(
-            kubeconfig=cluster.kubeconfig,
+            kubeconfig=cluster.kubeconfig_encrypted,
             context=cluster.context,
             namespace=namespace,
             name=name,
@@ -130,5 +187,7 @@ async def get_pod_logs(
             "tail_lines": tail_lines,
             "logs": logs
         }
+    except LogStreamLimitError as e:
+        raise HTTPException(status_code=429, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -2,67 +2,200 @@
 Authentication Service
 Handles JWT tokens, password hashing, and token validation
 """
+import asyncio
+import base64
 import hashlib
+import hmac
 import secrets
 import bcrypt
+import time
 from datetime import datetime, timedelta
-from typing import Optional, Tuple
-from jose import jwt, JWTError
+from typing import Optional, Tuple, Union
+from jose import jwk, jwt, JWTError
 
 from app.models.user import UserDB, RefreshTokenDB, UserCreate, TokenResponse, AuthProvider
+from app.core.cache import TTLCache
 from app.core.config import settings
 from app.services.user_repository import UserRepository
 from app.database import get_db
 from sqlalchemy.ext.asyncio import AsyncSession
 
 
+def _b64encode(data: bytes) -> str:
+    return base64.b64encode(data).decode('ascii').rstrip("=")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.b64decode(data + "=" * (-len(data) % 4))
+
+
+def _hash_refresh_token(raw: Union[str, bytes]) -> bytes:
+    """Digest used to store and look up refresh tokens"""
+    if isinstance(raw, str):
+        raw = raw.encode()
+    return hashlib.sha256(raw).digest()
+
+
 class AuthService:
     """Authentication service for JWT and password operations"""
     
     # JWT Settings
     SECRET_KEY = settings.jwt_secret_key
     ALGORITHM = "HS256"
+    # HMAC key object built once; jose would otherwise rebuild it per call
+    _SIGNING_KEY = jwk.construct(SECRET_KEY, ALGORITHM)
     ACCESS_TOKEN_EXPIRE_MINUTES = 15
     REFRESH_TOKEN_EXPIRE_DAYS = 7
     
+    # Verified access-token claims; clients resend the same token on every
+    # request, so this skips the HMAC check for all but the first
+    _claims_cache = TTLCache(maxsize=10_000, ttl=30)
+    
+    # Hashes of refresh tokens the DB reports as revoked, expired or unknown,
+    # added only after a revocation has committed; a dead token never comes
+    # back, so replays are rejected without the DB
+    _dead_refresh_tokens = TTLCache(maxsize=10_000, ttl=REFRESH_TOKEN_EXPIRE_DAYS * 86400)
+    
+    # jti of access tokens revoked at logout, kept until the token would have
+    # expired anyway. Per process: other workers accept the token until exp
+    _revoked_access_tokens = TTLCache(maxsize=10_000, ttl=ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+    
+    # Password hashing costs ~100 ms per call; cap how many run at once in the thread pool
+    _hash_slots = asyncio.Semaphore(8)
+    
+    # New hashes use scrypt; bcrypt hashes from older accounts are still
+    # accepted and upgraded on the next successful login
+    SCRYPT_PREFIX = "$scrypt$"
+    SCRYPT_R = 8
+    SCRYPT_P = 1
+    # Cost for new hashes: settings.scrypt_log_n, or higher after calibrate_scrypt()
+    _scrypt_log_n = settings.scrypt_log_n
+    # Calibration ceiling; each step doubles memory (2**17 -> 128 MiB per hash)
+    SCRYPT_MAX_LOG_N = 17
+    
     # Password methods
-    @staticmethod
-    def hash_password(password: str) -> str:
-        return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    @classmethod
+    def calibrate_scrypt(cls, target_ms: int) -> int:
+        """
+        Raise the scrypt cost from the configured floor while a hash on this
+        host still fits in `target_ms`. Blocking; run it once at startup.
+        """
+        log_n = settings.scrypt_log_n
+        salt = secrets.token_bytes(16)
+        while log_n < cls.SCRYPT_MAX_LOG_N:
+            started = time.perf_counter()
+            cls._scrypt("calibration", salt, log_n + 1, cls.SCRYPT_R, cls.SCRYPT_P)
+            if (time.perf_counter() - started) * 1000 > target_ms:
+                break
+            log_n += 1
+        cls._scrypt_log_n = log_n
+        return log_n
+    
+    @classmethod
+    def hash_password(cls, password: str) -> str:
+        log_n = cls._scrypt_log_n
+        salt = secrets.token_bytes(16)
+        key = cls._scrypt(password, salt, log_n, cls.SCRYPT_R, cls.SCRYPT_P)
+        return (
+            f"{cls.SCRYPT_PREFIX}ln={log_n},r={cls.SCRYPT_R},p={cls.SCRYPT_P}"
+            f"${_b64encode(salt)}${_b64encode(key)}"
+        )
+    
+    @classmethod
+    def verify_password(cls, plain_password: str, hashed_password: str) -> bool:
+        if not hashed_password.startswith(cls.SCRYPT_PREFIX):
+            return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+        
+        try:
+            params, salt, key = hashed_password[len(cls.SCRYPT_PREFIX):].split("$")
+            opts = dict(item.split("=", 1) for item in params.split(","))
+            log_n, r, p = int(opts["ln"]), int(opts["r"]), int(opts["p"])
+            salt, key = _b64decode(salt), _b64decode(key)
+        except (KeyError, ValueError):
+            return False
+        return hmac.compare_digest(cls._scrypt(plain_password, salt, log_n, r, p), key)
+    
+    @classmethod
+    def needs_rehash(cls, hashed_password: str) -> bool:
+        """True if a stored hash predates the current scheme or is cheaper than
+        the current cost (stronger hashes from better-calibrated hosts are kept)"""
+        if not hashed_password.startswith(cls.SCRYPT_PREFIX):
+            return True
+        params = hashed_password[len(cls.SCRYPT_PREFIX):].split(",", 1)[0]
+        try:
+            return int(params.removeprefix("ln=")) < cls._scrypt_log_n
+        except ValueError:
+            return True
     
     @staticmethod
-    def verify_password(plain_password: str, hashed_password: str) -> bool:
-        return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+    def _scrypt(password: str, salt: bytes, log_n: int, r: int, p: int) -> bytes:
+        n = 1 << log_n
+        return hashlib.scrypt(
+            password.encode('utf-8'), salt=salt, n=n, r=r, p=p,
+            maxmem=256 * n * r, dklen=32,
+        )
+    
+    @classmethod
+    async def hash_password_async(cls, password: str) -> str:
+        """Hash a password off the event loop"""
+        async with cls._hash_slots:
+            return await asyncio.to_thread(cls.hash_password, password)
+    
+    @classmethod
+    async def verify_password_async(cls, plain_password: str, hashed_password: str) -> bool:
+        """Verify a password off the event loop"""
+        async with cls._hash_slots:
+            return await asyncio.to_thread(cls.verify_password, plain_password, hashed_password)
     
     # Token methods
     @classmethod
     def create_access_token(cls, user_id: str, extra_data: dict = None) -> str:
-        expire = datetime.utcnow() + timedelta(minutes=cls.ACCESS_TOKEN_EXPIRE_MINUTES)
+        # JWT exp is a Unix timestamp; no need to go through datetime
         payload = {
             "sub": user_id,
-            "exp": expire,
+            "exp": int(time.time()) + cls.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
             "type": "access",
+            "jti": secrets.token_urlsafe(12),
             **(extra_data or {})
         }
-        return jwt.encode(payload, cls.SECRET_KEY, algorithm=cls.ALGORITHM)
+        return jwt.encode(payload, cls._SIGNING_KEY, algorithm=cls.ALGORITHM)
     
     @classmethod
-    def create_refresh_token(cls) -> Tuple[str, str, datetime]:
+    def create_refresh_token(cls) -> Tuple[str, bytes, datetime]:
         """Returns (raw_token, token_hash, expires_at)"""
-        raw_token = secrets.token_urlsafe(32)
-        token_hash = hashlib.sha256(raw_token.encode()).hexdigest()
+        # Same format as secrets.token_urlsafe(32), hashed before it becomes a str
+        raw_token = base64.urlsafe_b64encode(secrets.token_bytes(32)).rstrip(b"=")
+        token_hash = _hash_refresh_token(raw_token)
         expires_at = datetime.utcnow() + timedelta(days=cls.REFRESH_TOKEN_EXPIRE_DAYS)
-        return raw_token, token_hash, expires_at
+        return raw_token.decode('ascii'), token_hash, expires_at
     
     @classmethod
     def decode_access_token(cls, token: str) -> Optional[dict]:
-        try:
-            payload = jwt.decode(token, cls.SECRET_KEY, algorithms=[cls.ALGORITHM])
-            if payload.get("type") != "access":
+        payload = cls._claims_cache.get(token)
+        if payload is None:
+            try:
+                payload = jwt.decode(token, cls._SIGNING_KEY, algorithms=[cls.ALGORITHM])
+                if payload.get("type") != "access":
+                    return None
+            except JWTError:
                 return None
-            return payload
-        except JWTError:
+            
+            # Entries never outlive the token itself, so hits need no exp check
+            cls._claims_cache.set(token, payload, ttl=payload.get("exp", 0) - time.time())
+        
+        jti = payload.get("jti")
+        if jti and jti in cls._revoked_access_tokens:
             return None
+        return payload
+    
+    @classmethod
+    def revoke_access_token(cls, token: str) -> None:
+        """Reject an access token in this process for the rest of its lifetime"""
+        payload = cls.decode_access_token(token)
+        if payload and payload.get("jti"):
+            cls._revoked_access_tokens.set(
+                payload["jti"], True, ttl=payload.get("exp", 0) - time.time()
+            )
     
     # User authentication
     @classmethod
@@ -76,7 +209,7 @@ class AuthService:
         # Create user
         user = UserDB(
             email=data.email.lower(),
-            password_hash=cls.hash_password(data.password),
+            password_hash=await cls.hash_password_async(data.password),
             name=data.name,
             auth_provider=AuthProvider.LOCAL,
         )
@@ -93,12 +226,16 @@ class AuthService:
         if not user.password_hash:
             return None, f"Please login with {user.auth_provider.value}"
         
-        if not cls.verify_password(password, user.password_hash):
+        if not await cls.verify_password_async(password, user.password_hash):
             return None, "Invalid email or password"
         
         if not user.is_active:
             return None, "Account is disabled"
         
+        if cls.needs_rehash(user.password_hash):
+            user.password_hash = await cls.hash_password_async(password)
+            await UserRepository.update_password_hash(db, user.id, user.password_hash)
+        
         return user, None
     
     @classmethod
@@ -127,16 +264,20 @@ class AuthService:
     @classmethod
     async def refresh_access_token(cls, refresh_token: str, db: AsyncSession) -> Tuple[TokenResponse, str]:
         """Refresh access token. Returns (tokens, error_message)"""
-        token_hash = hashlib.sha256(refresh_token.encode()).hexdigest()
+        token_hash = _hash_refresh_token(refresh_token)
+        if token_hash in cls._dead_refresh_tokens:
+            return None, "Invalid refresh token"
         
         # Find token
         token_db = await UserRepository.get_refresh_token_by_hash(db, token_hash)
         if not token_db:
+            cls._dead_refresh_tokens.set(token_hash, True)
             return None, "Invalid refresh token"
         
         # Check expiry
         if token_db.expires_at < datetime.utcnow():
             await UserRepository.revoke_refresh_token(db, token_db.id)
+            cls._dead_refresh_tokens.set(token_hash, True)
             return None, "Refresh token expired"
         
         # Get user
@@ -144,8 +285,10 @@ class AuthService:
         if not user or not user.is_active:
             return None, "User not found or inactive"
         
-        # Revoke old token (rotation)
+        # Revoke old token (rotation); revoke_refresh_token commits, so the
+        # hash is only cached once the revocation is durable
         await UserRepository.revoke_refresh_token(db, token_db.id)
+        cls._dead_refresh_tokens.set(token_hash, True)
         
         # Create new tokens
         tokens = await cls.create_tokens(user, db)
@@ -154,11 +297,15 @@ class AuthService:
     @classmethod
     async def logout(cls, refresh_token: str, db: AsyncSession) -> bool:
         """Revoke refresh token"""
-        token_hash = hashlib.sha256(refresh_token.encode()).hexdigest()
+        token_hash = _hash_refresh_token(refresh_token)
+        if token_hash in cls._dead_refresh_tokens:
+            return False
         token_db = await UserRepository.get_refresh_token_by_hash(db, token_hash)
         if token_db:
             await UserRepository.revoke_refresh_token(db, token_db.id)
+            cls._dead_refresh_tokens.set(token_hash, True)
             return True
+        cls._dead_refresh_tokens.set(token_hash, True)
         return False
     
     @classmethod
@@ -1,33 +1,57 @@
 """
 Cluster service - business logic for cluster management
 """
-from sqlalchemy import select
+import asyncio
+import uuid
+from sqlalchemy import Row, delete, func, insert, or_, select, update
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import raiseload
+from sqlalchemy.orm.attributes import set_committed_value
 from sqlalchemy.exc import IntegrityError
-from typing import List, Optional
+from typing import List, Optional, Tuple, Union
 from uuid import UUID
 from pathlib import Path
-import yaml
 from kubernetes import client, config
 from kubernetes.config import ConfigException
-import tempfile
-import os
 
 from app.models import Cluster
 from app.schemas import ClusterCreate, ClusterUpdate, ClusterConnectionTest
+from app.core.yaml import load_yaml, load_yaml_file, dump_yaml
 from app.services.encryption import encrypt_kubeconfig, decrypt_kubeconfig
 
 
+# Columns served by list endpoints - must match ClusterResponse's fields,
+# since list_clusters serializes these rows without validation
+CLUSTER_SUMMARY_COLUMNS = (
+    Cluster.id,
+    Cluster.name,
+    Cluster.description,
+    Cluster.tags,
+    Cluster.context,
+    Cluster.is_active,
+    Cluster.is_connected,
+    Cluster.version,
+    Cluster.node_count,
+    Cluster.pod_count,
+    Cluster.owner_id,
+    Cluster.created_at,
+    Cluster.updated_at,
+    Cluster.last_connected_at,
+)
+
+# Relationships (owner, events, metrics) are never needed by the cluster
+# routes; make an accidental per-row lazy load fail loudly instead of
+# silently issuing N extra queries. Load them explicitly with selectinload.
+NO_LAZY_LOADS = raiseload('*')
+
+
 class ClusterService:
     """Service for managing Kubernetes clusters"""
     
     @staticmethod
-    async def create_cluster(
-        db: AsyncSession,
-        cluster_data: ClusterCreate,
-        owner_id: UUID
-    ) -> Cluster:
-        """Create a new cluster"""
+    async def _cluster_values(cluster_data: ClusterCreate, owner_id: UUID) -> dict:
+        """Resolve and encrypt the kubeconfig; returns column values for a new cluster"""
         kubeconfig_content = cluster_data.kubeconfig
         context = cluster_data.context
         
@@ -37,15 +61,19 @@ class ClusterService:
             if not kubeconfig_path.exists():
                 raise ValueError("No local kubeconfig found at ~/.kube/config")
             
-            with open(kubeconfig_path, 'r') as f:
-                local_config = yaml.safe_load(f)
+            local_config = await asyncio.to_thread(load_yaml_file, kubeconfig_path)
             
             # Extract the specific context
             context_name = cluster_data.context_name
             context = context_name
             
+            # Index the kubeconfig sections by name
+            contexts = {c['name']: c for c in local_config.get('contexts') or []}
+            clusters = {c['name']: c for c in local_config.get('clusters') or []}
+            users = {u['name']: u for u in local_config.get('users') or []}
+            
             # Find context definition
-            ctx_def = next((c for c in local_config.get('contexts', []) if c['name'] == context_name), None)
+            ctx_def = contexts.get(context_name)
             if not ctx_def:
                 raise ValueError(f"Context '{context_name}' not found in kubeconfig")
             
@@ -54,8 +82,8 @@ class ClusterService:
             user_name = ctx_info['user']
             
             # Find cluster and user definitions
-            cluster_def = next((c for c in local_config.get('clusters', []) if c['name'] == cluster_name), None)
-            user_def = next((u for u in local_config.get('users', []) if u['name'] == user_name), None)
+            cluster_def = clusters.get(cluster_name)
+            user_def = users.get(user_name)
             
             if not cluster_def or not user_def:
                 raise ValueError(f"Cluster or user definition not found for context '{context_name}'")
@@ -70,31 +98,36 @@ class ClusterService:
                 'users': [user_def]
             }
             
-            kubeconfig_content = yaml.dump(minimal_config)
+            kubeconfig_content = dump_yaml(minimal_config)
         
         if not kubeconfig_content:
             raise ValueError("Either kubeconfig or context_name must be provided")
         
-        # Encrypt kubeconfig
-        encrypted_kubeconfig = encrypt_kubeconfig(kubeconfig_content)
-        
-        # Create cluster object
-        cluster = Cluster(
-            name=cluster_data.name,
-            description=cluster_data.description,
-            kubeconfig_encrypted=encrypted_kubeconfig,
-            context=context,
-            tags=cluster_data.tags or [],
-            owner_id=owner_id,
-            is_active=False,
-            is_connected=False
-        )
-        
-        db.add(cluster)
+        return {
+            'name': cluster_data.name,
+            'description': cluster_data.description,
+            'kubeconfig_encrypted': encrypt_kubeconfig(kubeconfig_content),
+            'context': context,
+            'tags': cluster_data.tags or [],
+            'owner_id': owner_id,
+            'is_active': False,
+            'is_connected': False,
+        }
+    
+    @staticmethod
+    async def create_cluster(
+        db: AsyncSession,
+        cluster_data: ClusterCreate,
+        owner_id: UUID
+    ) -> Cluster:
+        """Create a new cluster"""
+        values = await ClusterService._cluster_values(cluster_data, owner_id)
         
+        # INSERT ... RETURNING hands back the server-filled columns
+        # (timestamps, counters) without a refresh SELECT
         try:
+            cluster = await db.scalar(insert(Cluster).values(**values).returning(Cluster))
             await db.commit()
-            await db.refresh(cluster)
         except IntegrityError as e:
             await db.rollback()
             # Check if it's a unique constraint violation on name
@@ -105,31 +138,101 @@ class ClusterService:
         
         return cluster
     
+    @staticmethod
+    async def upsert_cluster(
+        db: AsyncSession,
+        cluster_data: ClusterCreate,
+        owner_id: UUID
+    ) -> Tuple[Cluster, bool]:
+        """
+        Create a cluster, or return the owner's existing cluster of that name.
+        Returns (cluster, created). A name taken by another owner is an error.
+        """
+        # Re-imports are answered from the row as stored: no kubeconfig
+        # resolution or encryption, so they still work after the context
+        # has left the local kubeconfig
+        existing = await ClusterService.get_cluster_by_name(db, owner_id, cluster_data.name)
+        if existing:
+            return existing, False
+        
+        values = await ClusterService._cluster_values(cluster_data, owner_id)
+        values['id'] = uuid.uuid4()
+        
+        dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+        stmt = dialect.insert(Cluster).values(**values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Cluster.name],
+            # A concurrent import may have inserted the name since the
+            # lookup; the no-op update makes RETURNING yield that row
+            set_={'name': stmt.excluded.name},
+            where=Cluster.owner_id == stmt.excluded.owner_id,
+        ).returning(Cluster)
+        
+        try:
+            cluster = await db.scalar(stmt)
+            await db.commit()
+        except IntegrityError:
+            await db.rollback()
+            raise
+        
+        if cluster is None:
+            raise ValueError(f"A cluster with the name '{cluster_data.name}' already exists")
+        # Our freshly generated id only comes back if the row was inserted
+        return cluster, cluster.id == values['id']
+    
     @staticmethod
     async def get_cluster(db: AsyncSession, cluster_id: UUID) -> Optional[Cluster]:
         """Get cluster by ID"""
-        result = await db.execute(
-            select(Cluster).where(Cluster.id == cluster_id)
+        # Served from the identity map when the route already loaded it
+        # (update/delete after the ownership check) - no second query
+        return await db.get(Cluster, cluster_id, options=[NO_LAZY_LOADS])
+    
+    @staticmethod
+    async def get_owned_cluster(db: AsyncSession, cluster_id: UUID, owner_id: UUID) -> Optional[Cluster]:
+        """Get cluster by ID, only if it belongs to owner_id"""
+        return await db.scalar(
+            select(Cluster)
+            .where(Cluster.id == cluster_id, Cluster.owner_id == owner_id)
+            .options(NO_LAZY_LOADS)
+            .limit(1)
+        )
+    
+    @staticmethod
+    async def get_cluster_by_name(db: AsyncSession, owner_id: UUID, name: str) -> Optional[Cluster]:
+        """Get a user's cluster by name"""
+        return await db.scalar(
+            select(Cluster)
+            .where(Cluster.owner_id == owner_id, Cluster.name == name)
+            .options(NO_LAZY_LOADS)
+            .limit(1)
         )
-        return result.scalar_one_or_none()
     
     @staticmethod
     async def get_clusters(
         db: AsyncSession,
         owner_id: Optional[UUID] = None,
         skip: int = 0,
-        limit: int = 100
-    ) -> List[Cluster]:
-        """Get list of clusters"""
-        query = select(Cluster)
+        limit: int = 100,
+        with_count: bool = False
+    ) -> Union[List[Row], Tuple[List[Row], int]]:
+        """
+        Get list of clusters as read-only rows
         
-        if owner_id:
-            query = query.where(Cluster.owner_id == owner_id)
+        Selects the summary columns only (no kubeconfig) and skips ORM
+        hydration; rows support attribute access like Cluster instances.
+        With with_count, returns (rows, total) where total ignores skip/limit.
+        """
+        filters = [Cluster.owner_id == owner_id] if owner_id else []
         
-        query = query.offset(skip).limit(limit)
+        query = select(*CLUSTER_SUMMARY_COLUMNS).where(*filters).offset(skip).limit(limit)
         
         result = await db.execute(query)
-        return list(result.scalars().all())
+        clusters = list(result.all())
+        if not with_count:
+            return clusters
+        
+        total = await db.scalar(select(func.count()).select_from(Cluster).where(*filters))
+        return clusters, total
     
     @staticmethod
     async def update_cluster(
@@ -160,14 +263,12 @@ class ClusterService:
     @staticmethod
     async def delete_cluster(db: AsyncSession, cluster_id: UUID) -> bool:
         """Delete cluster"""
-        cluster = await ClusterService.get_cluster(db, cluster_id)
-        if not cluster:
-            return False
-        
-        await db.delete(cluster)
+        # One DELETE by primary key; events and metrics go with it through
+        # ON DELETE CASCADE, so nothing needs loading first
+        result = await db.execute(delete(Cluster).where(Cluster.id == cluster_id))
         await db.commit()
         
-        return True
+        return result.rowcount > 0
     
     @staticmethod
     async def test_connection(cluster: Cluster) -> ClusterConnectionTest:
@@ -176,18 +277,18 @@ class ClusterService:
             # Decrypt kubeconfig
             kubeconfig_content = decrypt_kubeconfig(cluster.kubeconfig_encrypted)
             
-            # Write to temp file
-            with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.yaml') as f:
-                f.write(kubeconfig_content)
-                temp_kubeconfig = f.name
-            
             try:
-                # Load kubeconfig
-                config.load_kube_config(config_file=temp_kubeconfig, context=cluster.context)
+                # Build a throwaway client straight from the parsed config
+                api_client = config.new_client_from_config_dict(
+                    load_yaml(kubeconfig_content),
+                    context=cluster.context,
+                    persist_config=False
+                )
                 
                 # Test connection
-                v1 = client.VersionApi()
-                version_info = v1.get_code()
+                with api_client:
+                    v1 = client.VersionApi(api_client)
+                    version_info = await asyncio.to_thread(v1.get_code)
                 
                 return ClusterConnectionTest(
                     connected=True,
@@ -204,10 +305,6 @@ class ClusterService:
                     connected=False,
                     error=f"Connection failed: {str(e)}"
                 )
-            finally:
-                # Clean up temp file
-                if os.path.exists(temp_kubeconfig):
-                    os.unlink(temp_kubeconfig)
         
         except Exception as e:
             return ClusterConnectionTest(
@@ -216,23 +313,23 @@ class ClusterService:
             )
     
     @staticmethod
-    async def activate_cluster(db: AsyncSession, cluster_id: UUID) -> Optional[Cluster]:
+    async def activate_cluster(db: AsyncSession, cluster: Cluster) -> Cluster:
         """Set cluster as active (deactivate others)"""
-        cluster = await ClusterService.get_cluster(db, cluster_id)
-        if not cluster:
-            return None
-        
-        # Deactivate all clusters for this owner
-        await db.execute(
-            Cluster.__table__.update()
-            .where(Cluster.owner_id == cluster.owner_id)
-            .values(is_active=False)
+        # Flip this cluster on and the owner's other active ones off in one statement
+        result = await db.execute(
+            update(Cluster)
+            .where(
+                Cluster.owner_id == cluster.owner_id,
+                or_(Cluster.is_active == True, Cluster.id == cluster.id)
+            )
+            .values(is_active=(Cluster.id == cluster.id))
+            .returning(Cluster.id, Cluster.updated_at)
+            .execution_options(synchronize_session=False)
         )
-        
-        # Activate this cluster
-        cluster.is_active = True
-        
+        updated_at = next(row.updated_at for row in result if row.id == cluster.id)
         await db.commit()
-        await db.refresh(cluster)
         
+        # Mirror the new row state without another round trip
+        set_committed_value(cluster, "is_active", True)
+        set_committed_value(cluster, "updated_at", updated_at)
         return cluster
@@ -2,7 +2,8 @@
 Encryption service for sensitive data (kubeconfig)
 Uses Fernet (AES-128-CBC) from cryptography library
 """
-from cryptography.fernet import Fernet
+from cryptography.fernet import Fernet, MultiFernet
+from typing import Union
 import os
 
 
@@ -10,7 +11,9 @@ class EncryptionService:
     """Service for encrypting and decrypting sensitive data"""
     
     def __init__(self):
-        # Get encryption key from environment or generate one
+        # Get encryption keys from environment or generate one. ENCRYPTION_KEY
+        # may hold several comma-separated keys, newest first: data is
+        # encrypted with the first and decrypted with any of them.
         key_str = os.getenv("ENCRYPTION_KEY")
         
         if not key_str:
@@ -18,45 +21,61 @@ class EncryptionService:
             # In production, this should be stored securely (e.g., Kubernetes Secret, Vault)
             print("WARNING: No ENCRYPTION_KEY found in environment. Generating a new one.")
             print("In production, set ENCRYPTION_KEY environment variable!")
-            self.key = Fernet.generate_key()
-            print(f"Generated key (base64): {self.key.decode()}")
+            self.keys = [Fernet.generate_key()]
+            print(f"Generated key (base64): {self.keys[0].decode()}")
         else:
-            # Use existing key
-            self.key = key_str.encode() if isinstance(key_str, str) else key_str
+            # Use existing keys
+            self.keys = [k.strip().encode() for k in key_str.split(",") if k.strip()]
         
-        self.fernet = Fernet(self.key)
+        self.key = self.keys[0]
+        self.fernet = MultiFernet([Fernet(key) for key in self.keys])
     
-    def encrypt(self, data: str) -> str:
+    def encrypt(self, data: Union[str, bytes]) -> bytes:
         """
-        Encrypt string data
+        Encrypt data
         
         Args:
-            data: Plain text string to encrypt
+            data: Plain text (str is encoded as UTF-8)
             
         Returns:
-            Base64-encoded encrypted string
+            Fernet token (URL-safe base64 bytes)
         """
         if not data:
-            return ""
+            return b""
         
-        encrypted_bytes = self.fernet.encrypt(data.encode('utf-8'))
-        return encrypted_bytes.decode('utf-8')
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        return self.fernet.encrypt(data)
     
-    def decrypt(self, encrypted_data: str) -> str:
+    def decrypt(self, encrypted_data: Union[str, bytes]) -> bytes:
         """
         Decrypt encrypted data
         
         Args:
-            encrypted_data: Base64-encoded encrypted string
+            encrypted_data: Fernet token
             
         Returns:
-            Decrypted plain text string
+            Decrypted plain text bytes
         """
         if not encrypted_data:
-            return ""
+            return b""
         
-        decrypted_bytes = self.fernet.decrypt(encrypted_data.encode('utf-8'))
-        return decrypted_bytes.decode('utf-8')
+        return self.fernet.decrypt(encrypted_data)
+    
+    def rotate(self, encrypted_data: Union[str, bytes]) -> bytes:
+        """
+        Re-encrypt data under the current (first) key
+        
+        Args:
+            encrypted_data: Fernet token made with any configured key
+            
+        Returns:
+            Fernet token for the current key
+        """
+        if not encrypted_data:
+            return b""
+        
+        return self.fernet.rotate(encrypted_data)
     
     @staticmethod
     def generate_key() -> str:
@@ -74,11 +93,11 @@ encryption_service = EncryptionService()
 
 
 # Helper functions
-def encrypt_kubeconfig(kubeconfig: str) -> str:
+def encrypt_kubeconfig(kubeconfig: Union[str, bytes]) -> bytes:
     """Encrypt kubeconfig content"""
     return encryption_service.encrypt(kubeconfig)
 
 
-def decrypt_kubeconfig(encrypted_kubeconfig: str) -> str:
+def decrypt_kubeconfig(encrypted_kubeconfig: bytes) -> bytes:
     """Decrypt kubeconfig content"""
     return encryption_service.decrypt(encrypted_kubeconfig)
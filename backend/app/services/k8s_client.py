@@ -1,86 +1,133 @@
 """
 Kubernetes client service for interacting with K8s clusters
 """
-from typing import Optional, Dict, Any, List
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import AbstractSet, Optional, Dict, Any, AsyncIterator, Iterator, List
 from kubernetes import client, config
 from kubernetes.client.rest import ApiException
-import yaml
-import tempfile
-import os
+from app.core.log_streams import log_streams
+from app.core.yaml import load_yaml
+from app.k8s.client import tune_connection_pool
 from app.services.encryption import encryption_service
 
 
+# Per-container/per-condition rows are the most numerous objects in a pod
+# listing; slotted dataclasses are smaller than dicts and orjson encodes
+# them natively (don't pass them through jsonable_encoder)
+@dataclass(slots=True)
+class PodConditionView:
+    type: str
+    status: str
+    reason: Optional[str]
+    message: Optional[str]
+
+
+@dataclass(slots=True)
+class ContainerView:
+    name: str
+    image: Optional[str]
+    ready: bool
+    restart_count: int
+    state: Dict[str, Any]
+
+
 class KubernetesClientService:
     """Service for managing Kubernetes API clients"""
     
+    # Distinct (kubeconfig, context) pairs kept connected at once
+    MAX_API_CLIENTS = 32
+    
+    # Top-level keys of a pod dictionary that list_pods can project onto
+    POD_FIELDS = frozenset({
+        "name", "namespace", "uid", "created_at", "labels",
+        "status", "containers", "node_name", "restart_policy",
+    })
+    
     def __init__(self):
-        self._clients: Dict[str, client.CoreV1Api] = {}
+        self._api_clients: OrderedDict[tuple[bytes, str], client.ApiClient] = OrderedDict()
+        # Clients are looked up from worker threads (asyncio.to_thread)
+        self._lock = threading.Lock()
     
-    def get_client(self, kubeconfig: str, context: Optional[str] = None) -> client.CoreV1Api:
+    def get_api_client(self, kubeconfig: bytes, context: Optional[str] = None) -> client.ApiClient:
         """
-        Get or create a Kubernetes client for the given kubeconfig
+        Get or create a pooled ApiClient for the given kubeconfig
+        
+        Each (kubeconfig, context) pair gets its own ApiClient, and with it
+        its own urllib3 connection pool, so TLS sessions to the apiserver
+        are reused across requests. Least recently used clients are closed
+        once more than MAX_API_CLIENTS are open.
         
         Args:
             kubeconfig: Encrypted kubeconfig content
             context: Optional context name to use
             
         Returns:
-            CoreV1Api client instance
+            ApiClient instance
         """
-        # Decrypt kubeconfig
-        decrypted_config = encryption_service.decrypt(kubeconfig)
+        # Key on a digest of the ciphertext so cache hits skip decryption
+        # entirely without keeping every kubeconfig alive as a dict key;
+        # re-encrypting (rotating) a kubeconfig changes the key
+        fingerprint = hashlib.blake2b(kubeconfig, digest_size=16).digest()
+        cache_key = (fingerprint, context or 'default')
         
-        # Create a cache key
-        cache_key = f"{hash(decrypted_config)}:{context or 'default'}"
+        with self._lock:
+            api_client = self._api_clients.get(cache_key)
+            if api_client is not None:
+                self._api_clients.move_to_end(cache_key)
+                return api_client
         
-        if cache_key in self._clients:
-            return self._clients[cache_key]
+        # Build an isolated client (no temp file, no global default config)
+        configuration = client.Configuration()
+        config.load_kube_config_from_dict(
+            load_yaml(encryption_service.decrypt(kubeconfig)),
+            context=context,
+            client_configuration=configuration,
+            persist_config=False
+        )
+        api_client = client.ApiClient(tune_connection_pool(configuration))
         
-        # Write kubeconfig to temporary file
-        with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.yaml') as f:
-            f.write(decrypted_config)
-            temp_path = f.name
+        with self._lock:
+            existing = self._api_clients.get(cache_key)
+            if existing is not None:
+                # Another thread built one first; keep theirs
+                api_client.close()
+                return existing
+            self._api_clients[cache_key] = api_client
+            evicted = []
+            while len(self._api_clients) > self.MAX_API_CLIENTS:
+                evicted.append(self._api_clients.popitem(last=False)[1])
         
-        try:
-            # Load kubeconfig
-            config.load_kube_config(
-                config_file=temp_path,
-                context=context
-            )
-            
-            # Create client
-            v1_client = client.CoreV1Api()
-            
-            # Cache the client
-            self._clients[cache_key] = v1_client
-            
-            return v1_client
-        finally:
-            # Clean up temp file
-            if os.path.exists(temp_path):
-                os.unlink(temp_path)
+        for old_client in evicted:
+            old_client.close()
+        return api_client
+    
+    def get_client(self, kubeconfig: bytes, context: Optional[str] = None) -> client.CoreV1Api:
+        """Get CoreV1Api client for pods, services, etc."""
+        return client.CoreV1Api(self.get_api_client(kubeconfig, context))
     
-    def get_apps_client(self, kubeconfig: str, context: Optional[str] = None) -> client.AppsV1Api:
+    def get_apps_client(self, kubeconfig: bytes, context: Optional[str] = None) -> client.AppsV1Api:
         """Get AppsV1Api client for deployments, statefulsets, etc."""
-        decrypted_config = encryption_service.decrypt(kubeconfig)
-        
-        with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.yaml') as f:
-            f.write(decrypted_config)
-            temp_path = f.name
-        
-        try:
-            config.load_kube_config(config_file=temp_path, context=context)
-            return client.AppsV1Api()
-        finally:
-            if os.path.exists(temp_path):
-                os.unlink(temp_path)
+        return client.AppsV1Api(self.get_api_client(kubeconfig, context))
+    
+    def close(self):
+        """Close all pooled API clients"""
+        with self._lock:
+            api_clients = list(self._api_clients.values())
+            self._api_clients.clear()
+        for api_client in api_clients:
+            api_client.close()
     
     async def list_pods(
         self,
-        kubeconfig: str,
+        kubeconfig: bytes,
         context: Optional[str] = None,
         namespace: str = "default",
-        label_selector: Optional[str] = None
+        label_selector: Optional[str] = None,
+        fields: Optional[AbstractSet[str]] = None
     ) -> List[Dict[str, Any]]:
         """
         List pods in a namespace
@@ -90,60 +137,85 @@ class KubernetesClientService:
             context: K8s context
             namespace: Namespace to query (default: "default", use "" for all namespaces)
             label_selector: Optional label selector
+            fields: Optional subset of POD_FIELDS to include (default: all)
             
         Returns:
             List of pod dictionaries
         """
-        try:
+        pods = await self.iter_pods(kubeconfig, context, namespace, label_selector, fields)
+        # Model-to-dict conversion is CPU-bound for large clusters
+        return await asyncio.to_thread(list, pods)
+    
+    async def iter_pods(
+        self,
+        kubeconfig: bytes,
+        context: Optional[str] = None,
+        namespace: str = "default",
+        label_selector: Optional[str] = None,
+        fields: Optional[AbstractSet[str]] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Like list_pods, but converts pods to dictionaries lazily
+        
+        The API call happens up front, so errors are raised before the
+        caller starts consuming (e.g. before a streaming response begins).
+        """
+        def fetch():
             v1 = self.get_client(kubeconfig, context)
-            
             if namespace:
-                pods = v1.list_namespaced_pod(
+                return v1.list_namespaced_pod(
                     namespace=namespace,
                     label_selector=label_selector
                 )
-            else:
-                pods = v1.list_pod_for_all_namespaces(
-                    label_selector=label_selector
-                )
-            
-            return [self._pod_to_dict(pod) for pod in pods.items]
+            return v1.list_pod_for_all_namespaces(
+                label_selector=label_selector
+            )
+        
+        try:
+            pods = await asyncio.to_thread(fetch)
+            return (self._pod_to_dict(pod, fields) for pod in pods.items)
         except ApiException as e:
             raise Exception(f"Failed to list pods: {e}")
     
     async def get_pod(
         self,
-        kubeconfig: str,
+        kubeconfig: bytes,
         namespace: str,
         name: str,
         context: Optional[str] = None
     ) -> Dict[str, Any]:
         """Get a specific pod"""
         try:
-            v1 = self.get_client(kubeconfig, context)
-            pod = v1.read_namespaced_pod(name=name, namespace=namespace)
+            def fetch():
+                v1 = self.get_client(kubeconfig, context)
+                return v1.read_namespaced_pod(name=name, namespace=namespace)
+            
+            pod = await asyncio.to_thread(fetch)
             return self._pod_to_dict(pod)
         except ApiException as e:
             raise Exception(f"Failed to get pod: {e}")
     
     async def delete_pod(
         self,
-        kubeconfig: str,
+        kubeconfig: bytes,
         namespace: str,
         name: str,
         context: Optional[str] = None
     ) -> Dict[str, str]:
         """Delete a pod"""
         try:
-            v1 = self.get_client(kubeconfig, context)
-            v1.delete_namespaced_pod(name=name, namespace=namespace)
+            def delete():
+                v1 = self.get_client(kubeconfig, context)
+                v1.delete_namespaced_pod(name=name, namespace=namespace)
+            
+            await asyncio.to_thread(delete)
             return {"status": "success", "message": f"Pod {name} deleted"}
         except ApiException as e:
             raise Exception(f"Failed to delete pod: {e}")
     
     async def get_pod_logs(
         self,
-        kubeconfig: str,
+        kubeconfig: bytes,
         namespace: str,
         name: str,
         container: Optional[str] = None,
@@ -152,97 +224,146 @@ class KubernetesClientService:
     ) -> str:
         """Get pod logs"""
         try:
+            def fetch():
+                v1 = self.get_client(kubeconfig, context)
+                return v1.read_namespaced_pod_log(
+                    name=name,
+                    namespace=namespace,
+                    container=container,
+                    tail_lines=tail_lines
+                )
+            
+            return await asyncio.to_thread(fetch)
+        except ApiException as e:
+            raise Exception(f"Failed to get pod logs: {e}")
+    
+    async def stream_pod_logs(
+        self,
+        kubeconfig: bytes,
+        namespace: str,
+        name: str,
+        container: Optional[str] = None,
+        tail_lines: Optional[int] = None,
+        follow: bool = False,
+        context: Optional[str] = None
+    ) -> AsyncIterator[bytes]:
+        """
+        Open a pod log stream and return an async iterator of raw log chunks
+        
+        The request is made before returning, so API errors are raised here
+        rather than midway through a streaming response. Followed streams
+        also raise LogStreamLimitError once every slot is taken.
+        """
+        def open_stream():
             v1 = self.get_client(kubeconfig, context)
-            logs = v1.read_namespaced_pod_log(
+            return v1.read_namespaced_pod_log(
                 name=name,
                 namespace=namespace,
                 container=container,
-                tail_lines=tail_lines
+                tail_lines=tail_lines,
+                follow=follow,
+                _preload_content=False
             )
-            return logs
+        
+        if follow:
+            log_streams.acquire()
+        response = None
+        try:
+            response = await asyncio.to_thread(open_stream)
         except ApiException as e:
             raise Exception(f"Failed to get pod logs: {e}")
+        finally:
+            # The relay releases the slot; give it back if it never starts
+            if follow and response is None:
+                log_streams.release()
+        return self._iter_response(response, follow)
     
-    def _pod_to_dict(self, pod) -> Dict[str, Any]:
-        """Convert K8s pod object to dictionary"""
-        return {
-            "name": pod.metadata.name,
-            "namespace": pod.metadata.namespace,
-            "uid": pod.metadata.uid,
-            "created_at": pod.metadata.creation_timestamp.isoformat() if pod.metadata.creation_timestamp else None,
-            "labels": pod.metadata.labels or {},
-            "status": {
-                "phase": pod.status.phase,
+    @staticmethod
+    async def _iter_response(response, follow: bool = False) -> AsyncIterator[bytes]:
+        """Relay an unread urllib3 response chunk by chunk"""
+        # Followed streams can block for long stretches; keep them off the
+        # default executor
+        read = log_streams.read if follow else lambda it: asyncio.to_thread(next, it, None)
+        try:
+            chunks = response.stream(4096)
+            while (chunk := await read(chunks)) is not None:
+                yield chunk
+        finally:
+            # Drop the connection rather than pooling a half-read (followed) stream
+            response.close()
+            response.release_conn()
+            if follow:
+                log_streams.release()
+    
+    def _pod_to_dict(self, pod, fields: Optional[AbstractSet[str]] = None) -> Dict[str, Any]:
+        """Convert K8s pod object to dictionary, optionally only the given fields"""
+        metadata, spec, status = pod.metadata, pod.spec, pod.status
+        pod_dict = {
+            "name": metadata.name,
+            "namespace": metadata.namespace,
+            "uid": metadata.uid,
+            "created_at": metadata.creation_timestamp.isoformat() if metadata.creation_timestamp else None,
+            "labels": metadata.labels or {},
+        }
+        # Nested sections are the expensive part - skip them unless requested
+        if fields is None or "status" in fields:
+            pod_dict["status"] = {
+                "phase": status.phase,
                 "conditions": [
-                    {
-                        "type": c.type,
-                        "status": c.status,
-                        "reason": c.reason,
-                        "message": c.message
-                    }
-                    for c in (pod.status.conditions or [])
+                    PodConditionView(c.type, c.status, c.reason, c.message)
+                    for c in (status.conditions or [])
                 ],
-                "pod_ip": pod.status.pod_ip,
-                "host_ip": pod.status.host_ip,
-                "start_time": pod.status.start_time.isoformat() if pod.status.start_time else None,
-            },
-            "containers": [
-                {
-                    "name": c.name,
-                    "image": c.image,
-                    "ready": self._is_container_ready(pod, c.name),
-                    "restart_count": self._get_container_restart_count(pod, c.name),
-                    "state": self._get_container_state(pod, c.name)
-                }
-                for c in (pod.spec.containers or [])
-            ],
-            "node_name": pod.spec.node_name,
-            "restart_policy": pod.spec.restart_policy,
-        }
+                "pod_ip": status.pod_ip,
+                "host_ip": status.host_ip,
+                "start_time": status.start_time.isoformat() if status.start_time else None,
+            }
+        if fields is None or "containers" in fields:
+            # One pass over the statuses instead of a scan per container
+            statuses = {s.name: s for s in (status.container_statuses or [])}
+            pod_dict["containers"] = [
+                self._container_view(c, statuses.get(c.name))
+                for c in (spec.containers or [])
+            ]
+        pod_dict["node_name"] = spec.node_name
+        pod_dict["restart_policy"] = spec.restart_policy
+        
+        if fields is not None:
+            return {key: value for key, value in pod_dict.items() if key in fields}
+        return pod_dict
     
-    def _is_container_ready(self, pod, container_name: str) -> bool:
-        """Check if a container is ready"""
-        if not pod.status.container_statuses:
-            return False
-        for status in pod.status.container_statuses:
-            if status.name == container_name:
-                return status.ready
-        return False
-    
-    def _get_container_restart_count(self, pod, container_name: str) -> int:
-        """Get container restart count"""
-        if not pod.status.container_statuses:
-            return 0
-        for status in pod.status.container_statuses:
-            if status.name == container_name:
-                return status.restart_count
-        return 0
-    
-    def _get_container_state(self, pod, container_name: str) -> Dict[str, Any]:
+    def _container_view(self, container, status) -> ContainerView:
+        """Convert a container spec and its status (if reported)"""
+        if status is None:
+            return ContainerView(container.name, container.image, False, 0, {"state": "unknown"})
+        return ContainerView(
+            container.name,
+            container.image,
+            status.ready,
+            status.restart_count,
+            self._get_container_state(status)
+        )
+    
+    def _get_container_state(self, status) -> Dict[str, Any]:
         """Get container state"""
-        if not pod.status.container_statuses:
-            return {"state": "unknown"}
-        
-        for status in pod.status.container_statuses:
-            if status.name == container_name:
-                if status.state.running:
-                    return {
-                        "state": "running",
-                        "started_at": status.state.running.started_at.isoformat() if status.state.running.started_at else None
-                    }
-                elif status.state.waiting:
-                    return {
-                        "state": "waiting",
-                        "reason": status.state.waiting.reason,
-                        "message": status.state.waiting.message
-                    }
-                elif status.state.terminated:
-                    return {
-                        "state": "terminated",
-                        "reason": status.state.terminated.reason,
-                        "exit_code": status.state.terminated.exit_code,
-                        "finished_at": status.state.terminated.finished_at.isoformat() if status.state.terminated.finished_at else None
-                    }
+        state = status.state
+        if state.running:
+            return {
+                "state": "running",
+                "started_at": state.running.started_at.isoformat() if state.running.started_at else None
+            }
+        elif state.waiting:
+            return {
+                "state": "waiting",
+                "reason": state.waiting.reason,
+                "message": state.waiting.message
+            }
+        elif state.terminated:
+            return {
+                "state": "terminated",
+                "reason": state.terminated.reason,
+                "exit_code": state.terminated.exit_code,
+                "finished_at": state.terminated.finished_at.isoformat() if state.terminated.finished_at else None
+            }
         
         return {"state": "unknown"}
 
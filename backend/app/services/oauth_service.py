@@ -1,15 +1,65 @@
 """
 OAuth Service for Google and GitHub authentication
 """
+import asyncio
+import base64
+import hashlib
+import hmac
 import secrets
+import time
 import httpx
+import orjson
 from typing import Optional, Tuple
 from urllib.parse import urlencode
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.user import UserDB, AuthProvider, OAuthState
-from app.db import db
+from app.core.cache import TTLCache
 from app.core.config import settings
 from app.services.auth_service import auth_service
+from app.services.user_repository import UserRepository
+
+
+# Shared across callbacks so token and userinfo calls reuse warm connections
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def _get_client() -> httpx.AsyncClient:
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            limits=httpx.Limits(max_keepalive_connections=20, max_connections=100),
+            timeout=10.0,
+        )
+    return _http_client
+
+
+# Recently fetched profiles, keyed by provider and a digest of the access token
+_userinfo_cache = TTLCache(maxsize=1024, ttl=300)
+
+
+async def _get_user_info_cached(provider, access_token: str) -> Tuple["OAuthUserInfo", str]:
+    """Return the provider's profile for an access token, reusing recent lookups"""
+    if not access_token:
+        return None, "No access token returned by provider"
+    
+    key = (provider.__name__, hashlib.blake2b(access_token.encode(), digest_size=16).digest())
+    user_info = _userinfo_cache.get(key)
+    if user_info is not None:
+        return user_info, None
+    
+    user_info, error = await provider.fetch_user_info(access_token)
+    if user_info is not None:
+        _userinfo_cache.set(key, user_info)
+    return user_info, error
+
+
+async def close_http_client():
+    """Close the shared provider HTTP client (on shutdown)"""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
 
 
 class OAuthUserInfo:
@@ -26,55 +76,59 @@ class GoogleOAuth:
     AUTH_URL = "https://accounts.google.com/o/oauth2/v2/auth"
     TOKEN_URL = "https://oauth2.googleapis.com/token"
     USERINFO_URL = "https://www.googleapis.com/oauth2/v2/userinfo"
+    # Authorization URL up to the per-request parameters
+    _AUTH_URL_PREFIX = f"{AUTH_URL}?" + urlencode({
+        "client_id": settings.google_client_id,
+        "response_type": "code",
+        "scope": "openid email profile",
+        "access_type": "offline",
+    })
     
     @classmethod
     def get_authorization_url(cls, redirect_uri: str, state: str) -> str:
-        params = {
-            "client_id": settings.google_client_id,
-            "redirect_uri": redirect_uri,
-            "response_type": "code",
-            "scope": "openid email profile",
-            "state": state,
-            "access_type": "offline",
-        }
-        return f"{cls.AUTH_URL}?{urlencode(params)}"
+        return f"{cls._AUTH_URL_PREFIX}&{urlencode({'redirect_uri': redirect_uri, 'state': state})}"
     
     @classmethod
     async def exchange_code(cls, code: str, redirect_uri: str) -> Tuple[OAuthUserInfo, str]:
         """Exchange auth code for tokens and user info. Returns (user_info, error)"""
-        async with httpx.AsyncClient() as client:
-            # Exchange code for tokens
-            token_response = await client.post(cls.TOKEN_URL, data={
-                "client_id": settings.google_client_id,
-                "client_secret": settings.google_client_secret,
-                "code": code,
-                "grant_type": "authorization_code",
-                "redirect_uri": redirect_uri,
-            })
-            
-            if token_response.status_code != 200:
-                return None, f"Failed to exchange code: {token_response.text}"
-            
-            tokens = token_response.json()
-            access_token = tokens.get("access_token")
-            
-            # Get user info
-            userinfo_response = await client.get(
-                cls.USERINFO_URL,
-                headers={"Authorization": f"Bearer {access_token}"}
-            )
-            
-            if userinfo_response.status_code != 200:
-                return None, "Failed to get user info"
-            
-            data = userinfo_response.json()
-            user_info = OAuthUserInfo(
-                email=data["email"],
-                name=data.get("name", data["email"].split("@")[0]),
-                avatar_url=data.get("picture"),
-                provider_id=data["id"],
-            )
-            return user_info, None
+        client = _get_client()
+        
+        # Exchange code for tokens
+        token_response = await client.post(cls.TOKEN_URL, data={
+            "client_id": settings.google_client_id,
+            "client_secret": settings.google_client_secret,
+            "code": code,
+            "grant_type": "authorization_code",
+            "redirect_uri": redirect_uri,
+        })
+        
+        if token_response.status_code != 200:
+            return None, f"Failed to exchange code: {token_response.text}"
+        
+        tokens = token_response.json()
+        access_token = tokens.get("access_token")
+        
+        return await _get_user_info_cached(cls, access_token)
+    
+    @classmethod
+    async def fetch_user_info(cls, access_token: str) -> Tuple[OAuthUserInfo, str]:
+        """Fetch the profile for an access token. Returns (user_info, error)"""
+        userinfo_response = await _get_client().get(
+            cls.USERINFO_URL,
+            headers={"Authorization": f"Bearer {access_token}"}
+        )
+        
+        if userinfo_response.status_code != 200:
+            return None, "Failed to get user info"
+        
+        data = userinfo_response.json()
+        user_info = OAuthUserInfo(
+            email=data["email"],
+            name=data.get("name", data["email"].split("@")[0]),
+            avatar_url=data.get("picture"),
+            provider_id=data["id"],
+        )
+        return user_info, None
 
 
 class GitHubOAuth:
@@ -83,73 +137,87 @@ class GitHubOAuth:
     TOKEN_URL = "https://github.com/login/oauth/access_token"
     USERINFO_URL = "https://api.github.com/user"
     EMAILS_URL = "https://api.github.com/user/emails"
+    # Authorization URL up to the per-request parameters
+    _AUTH_URL_PREFIX = f"{AUTH_URL}?" + urlencode({
+        "client_id": settings.github_client_id,
+        "scope": "user:email read:user",
+    })
     
     @classmethod
     def get_authorization_url(cls, redirect_uri: str, state: str) -> str:
-        params = {
-            "client_id": settings.github_client_id,
-            "redirect_uri": redirect_uri,
-            "scope": "user:email read:user",
-            "state": state,
-        }
-        return f"{cls.AUTH_URL}?{urlencode(params)}"
+        return f"{cls._AUTH_URL_PREFIX}&{urlencode({'redirect_uri': redirect_uri, 'state': state})}"
     
     @classmethod
     async def exchange_code(cls, code: str, redirect_uri: str) -> Tuple[OAuthUserInfo, str]:
         """Exchange auth code for tokens and user info. Returns (user_info, error)"""
-        async with httpx.AsyncClient() as client:
-            # Exchange code for tokens
-            token_response = await client.post(
-                cls.TOKEN_URL,
-                data={
-                    "client_id": settings.github_client_id,
-                    "client_secret": settings.github_client_secret,
-                    "code": code,
-                    "redirect_uri": redirect_uri,
-                },
-                headers={"Accept": "application/json"}
-            )
-            
-            if token_response.status_code != 200:
-                return None, f"Failed to exchange code: {token_response.text}"
-            
-            tokens = token_response.json()
-            if "error" in tokens:
-                return None, tokens.get("error_description", tokens["error"])
-                
-            access_token = tokens.get("access_token")
-            
-            # Get user info
-            headers = {
-                "Authorization": f"Bearer {access_token}",
-                "Accept": "application/json",
-            }
+        client = _get_client()
+        
+        # Exchange code for tokens
+        token_response = await client.post(
+            cls.TOKEN_URL,
+            data={
+                "client_id": settings.github_client_id,
+                "client_secret": settings.github_client_secret,
+                "code": code,
+                "redirect_uri": redirect_uri,
+            },
+            headers={"Accept": "application/json"}
+        )
+        
+        if token_response.status_code != 200:
+            return None, f"Failed to exchange code: {token_response.text}"
+        
+        tokens = token_response.json()
+        if "error" in tokens:
+            return None, tokens.get("error_description", tokens["error"])
             
+        access_token = tokens.get("access_token")
+        
+        return await _get_user_info_cached(cls, access_token)
+    
+    @classmethod
+    async def fetch_user_info(cls, access_token: str) -> Tuple[OAuthUserInfo, str]:
+        """Fetch the profile for an access token. Returns (user_info, error)"""
+        client = _get_client()
+        headers = {
+            "Authorization": f"Bearer {access_token}",
+            "Accept": "application/json",
+        }
+        
+        emails_response = None
+        if settings.github_parallel_emails:
+            # The profile email is often private, so fetch both at once
+            userinfo_response, emails_response = await asyncio.gather(
+                client.get(cls.USERINFO_URL, headers=headers),
+                client.get(cls.EMAILS_URL, headers=headers),
+            )
+        else:
             userinfo_response = await client.get(cls.USERINFO_URL, headers=headers)
-            if userinfo_response.status_code != 200:
-                return None, "Failed to get user info"
-            
-            data = userinfo_response.json()
-            
-            # Get primary email if not in profile
-            email = data.get("email")
-            if not email:
+        if userinfo_response.status_code != 200:
+            return None, "Failed to get user info"
+        
+        data = userinfo_response.json()
+        
+        # Get primary email if not in profile
+        email = data.get("email")
+        if not email:
+            if emails_response is None:
                 emails_response = await client.get(cls.EMAILS_URL, headers=headers)
-                if emails_response.status_code == 200:
-                    emails = emails_response.json()
-                    primary = next((e for e in emails if e.get("primary")), emails[0] if emails else None)
-                    email = primary["email"] if primary else None
-            
-            if not email:
-                return None, "Could not get email from GitHub"
-            
-            user_info = OAuthUserInfo(
-                email=email,
-                name=data.get("name") or data.get("login", email.split("@")[0]),
-                avatar_url=data.get("avatar_url"),
-                provider_id=str(data["id"]),
-            )
-            return user_info, None
+            if emails_response.status_code == 200:
+                emails = emails_response.json()
+                primary = next((e for e in emails if e.get("primary")), emails[0] if emails else None)
+                email = primary["email"] if primary else None
+        
+        if not email:
+            return None, "Could not get email from GitHub"
+        
+        user_info = OAuthUserInfo(
+            email=email,
+            name=data.get("name") or data.get("login", email.split("@")[0]),
+            avatar_url=data.get("avatar_url"),
+            provider_id=str(data["id"]),
+        )
+        return user_info, None
 
 
 class OAuthService:
@@ -164,22 +232,51 @@ class OAuthService:
     def get_provider(cls, name: str):
         return cls.PROVIDERS.get(name)
     
+    # Seconds an issued OAuth state stays valid
+    STATE_TTL_SECONDS = 600
+    
+    # Keyed once with a state-only key derived from the JWT secret (salted,
+    # so a state signature can never double as anything else); copied per use
+    _STATE_MAC = hmac.new(
+        hmac.new(settings.jwt_secret_key.encode(), b"oauth-state", hashlib.sha256).digest(),
+        digestmod=hashlib.sha256,
+    )
+    
+    @classmethod
+    def _sign_state(cls, payload: bytes) -> str:
+        mac = cls._STATE_MAC.copy()
+        mac.update(payload)
+        return mac.hexdigest()[:32]
+    
     @classmethod
     def generate_state(cls, provider: str, redirect_uri: str) -> str:
-        """Generate state token for CSRF protection"""
-        nonce = secrets.token_urlsafe(16)
-        # In production, store state in Redis/DB with expiry
-        return f"{provider}:{nonce}"
+        """Generate a signed, self-contained state token for CSRF protection"""
+        payload = base64.urlsafe_b64encode(orjson.dumps({
+            "p": provider,
+            "u": redirect_uri,
+            "n": secrets.token_urlsafe(8),
+            "e": int(time.time()) + cls.STATE_TTL_SECONDS,
+        })).rstrip(b"=")
+        return f"{payload.decode()}.{cls._sign_state(payload)}"
     
     @classmethod
-    def parse_state(cls, state: str) -> Tuple[str, str]:
-        """Parse state token. Returns (provider, nonce)"""
-        parts = state.split(":", 1)
-        return parts[0], parts[1] if len(parts) > 1 else ""
+    def verify_state(cls, state: str) -> Optional[Tuple[str, str]]:
+        """Verify a state token. Returns (provider, redirect_uri), or None if
+        the signature does not match or the state has expired"""
+        payload, _, signature = state.rpartition(".")
+        if not payload or not hmac.compare_digest(signature, cls._sign_state(payload.encode())):
+            return None
+        try:
+            data = orjson.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+        except ValueError:
+            return None
+        if data.get("e", 0) < time.time():
+            return None
+        return data.get("p"), data.get("u")
     
     @classmethod
     async def handle_callback(
-        cls, provider_name: str, code: str, redirect_uri: str
+        cls, provider_name: str, code: str, redirect_uri: str, db: AsyncSession
     ) -> Tuple[UserDB, str]:
         """Handle OAuth callback. Returns (user, error)"""
         provider = cls.get_provider(provider_name)
@@ -191,27 +288,15 @@ class OAuthService:
         if error:
             return None, error
         
-        # Find or create user
-        existing_user = await db.get_user_by_email(user_info.email)
-        
-        if existing_user:
-            # Update avatar if needed
-            if user_info.avatar_url and not existing_user.avatar_url:
-                existing_user.avatar_url = user_info.avatar_url
-                await db.update_user(existing_user)
-            return existing_user, None
-        
-        # Create new user
-        auth_provider = AuthProvider(provider_name)
-        new_user = UserDB(
-            email=user_info.email.lower(),
+        # Find or create user in one round-trip
+        user = await UserRepository.upsert_oauth_user(
+            db,
+            email=user_info.email,
             name=user_info.name,
             avatar_url=user_info.avatar_url,
-            auth_provider=auth_provider,
-            is_verified=True,  # OAuth emails are verified
+            provider=AuthProvider(provider_name),
         )
-        await db.create_user(new_user)
-        return new_user, None
+        return user, None
 
 
 oauth_service = OAuthService()
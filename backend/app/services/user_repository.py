@@ -2,132 +2,206 @@
 User repository for database operations
 Replaces the JSON-based database with PostgreSQL
 """
-from typing import Optional, List
+from typing import Optional, List, Union
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import Row, delete, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.sql import func
 from datetime import datetime
 import uuid
 
+from app.core.cache import TTLCache
 from app.models.database import User, RefreshToken
 from app.models.user import UserDB, RefreshTokenDB, AuthProvider
 
 
+# Columns needed to build a UserDB; selecting them directly skips ORM hydration
+USER_COLUMNS = (
+    User.id,
+    User.email,
+    User.name,
+    User.hashed_password,
+    User.avatar_url,
+    User.is_active,
+    User.created_at,
+    User.updated_at,
+)
+
+
+def _as_uuid(value: Union[str, uuid.UUID]) -> uuid.UUID:
+    """Parse an id only if it is still a string"""
+    return uuid.UUID(value) if isinstance(value, str) else value
+
+
+# Recently loaded users by id; the auth path looks the caller up on every request.
+# Invalidation is per process: invalidate_user() clears only this worker's copy,
+# and changes made elsewhere (other workers, manage_users.py) are not seen here.
+# A deleted or disabled user can therefore pass get_current_user for up to this
+# TTL, plus the token cache in app.api.auth. Principal routes never reload the
+# user at all; they accept the access token until it expires.
+_user_cache = TTLCache(maxsize=1024, ttl=60)
+
+
 class UserRepository:
     """Repository for User operations"""
     
     @staticmethod
-    async def create_user(db: AsyncSession, user: UserDB) -> User:
-        """Create a new user in PostgreSQL"""
-        db_user = User(
-            id=uuid.UUID(user.id) if isinstance(user.id, str) else user.id,
+    def _to_user_db(user: Row) -> UserDB:
+        return UserDB(
+            id=str(user.id),
             email=user.email,
             name=user.name,
-            hashed_password=user.password_hash,
+            password_hash=user.hashed_password,
             avatar_url=user.avatar_url,
             is_active=user.is_active,
-            is_superuser=False,
+            is_verified=True,  # All local users are verified
+            auth_provider=AuthProvider.LOCAL,
+            created_at=user.created_at,
+            updated_at=user.updated_at,
+        )
+    
+    @staticmethod
+    def _user_values(user: UserDB) -> dict:
+        return {
+            "id": _as_uuid(user.id),
+            "email": user.email,
+            "name": user.name,
+            "hashed_password": user.password_hash,
+            "avatar_url": user.avatar_url,
+            "is_active": user.is_active,
+            "is_superuser": False,
+        }
+    
+    @staticmethod
+    async def create_user(db: AsyncSession, user: UserDB) -> User:
+        """Create a new user in PostgreSQL"""
+        # INSERT ... RETURNING hands back server defaults without a refresh SELECT
+        db_user = await db.scalar(
+            insert(User)
+            .values(**UserRepository._user_values(user))
+            .returning(User)
         )
-        db.add(db_user)
         await db.commit()
-        await db.refresh(db_user)
         return db_user
     
     @staticmethod
-    async def get_user_by_id(db: AsyncSession, user_id: str) -> Optional[UserDB]:
-        """Get user by ID"""
-        result = await db.execute(
-            select(User).where(User.id == uuid.UUID(user_id))
+    async def upsert_oauth_user(
+        db: AsyncSession, email: str, name: str, avatar_url: Optional[str], provider: AuthProvider
+    ) -> UserDB:
+        """
+        Create an OAuth user, or fetch the existing one with the same email,
+        in a single INSERT ... ON CONFLICT ... RETURNING round-trip.
+        An existing user only picks up the avatar if they have none yet.
+        """
+        dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+        stmt = dialect.insert(User).values(
+            id=uuid.uuid4(),
+            email=email.lower(),
+            name=name,
+            hashed_password="",  # OAuth users log in through their provider
+            avatar_url=avatar_url,
+            is_active=True,
+            is_superuser=False,
         )
-        user = result.scalar_one_or_none()
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[func.lower(User.email)],
+            set_={"avatar_url": func.coalesce(User.avatar_url, stmt.excluded.avatar_url)},
+        ).returning(*USER_COLUMNS)
+        
+        user = (await db.execute(stmt)).one()
+        await db.commit()
+        UserRepository.invalidate_user(str(user.id))
         
+        user_db = UserRepository._to_user_db(user)
+        if not user_db.password_hash:
+            user_db.auth_provider = provider
+        return user_db
+    
+    @staticmethod
+    async def get_user_by_id(db: AsyncSession, user_id: Union[str, uuid.UUID]) -> Optional[UserDB]:
+        """Get user by ID (cached for up to a minute)"""
+        cached = _user_cache.get(str(user_id))
+        if cached is not None:
+            return cached
+        
+        result = await db.execute(
+            select(*USER_COLUMNS).where(User.id == _as_uuid(user_id))
+        )
+        user = result.first()
         if not user:
             return None
         
-        return UserDB(
-            id=str(user.id),
-            email=user.email,
-            name=user.name,
-            password_hash=user.hashed_password,
-            avatar_url=user.avatar_url,
-            is_active=user.is_active,
-            is_verified=True,  # All local users are verified
-            auth_provider=AuthProvider.LOCAL,
-            created_at=user.created_at,
-            updated_at=user.updated_at,
-        )
+        user_db = UserRepository._to_user_db(user)
+        _user_cache.set(user_db.id, user_db)
+        return user_db
+    
+    @staticmethod
+    def invalidate_user(user_id: Union[str, uuid.UUID]) -> None:
+        """Drop a user from this process's by-id cache after it changes"""
+        _user_cache.pop(str(user_id))
     
     @staticmethod
     async def get_user_by_email(db: AsyncSession, email: str) -> Optional[UserDB]:
         """Get user by email"""
         result = await db.execute(
-            select(User).where(func.lower(User.email) == email.lower())
+            select(*USER_COLUMNS).where(func.lower(User.email) == email.lower())
         )
-        user = result.scalar_one_or_none()
-        
-        if not user:
-            return None
-        
-        return UserDB(
-            id=str(user.id),
-            email=user.email,
-            name=user.name,
-            password_hash=user.hashed_password,
-            avatar_url=user.avatar_url,
-            is_active=user.is_active,
-            is_verified=True,
-            auth_provider=AuthProvider.LOCAL,
-            created_at=user.created_at,
-            updated_at=user.updated_at,
+        user = result.first()
+        return UserRepository._to_user_db(user) if user else None
+    
+    @staticmethod
+    async def update_password_hash(db: AsyncSession, user_id: Union[str, uuid.UUID], password_hash: str) -> None:
+        """Replace a user's stored password hash"""
+        await db.execute(
+            update(User)
+            .where(User.id == _as_uuid(user_id))
+            .values(hashed_password=password_hash)
         )
+        await db.commit()
+        UserRepository.invalidate_user(user_id)
+    
+    @staticmethod
+    async def delete_user(db: AsyncSession, user_id: Union[str, uuid.UUID]) -> bool:
+        """Delete a user (their clusters and refresh tokens cascade)"""
+        result = await db.execute(
+            delete(User).where(User.id == _as_uuid(user_id))
+        )
+        await db.commit()
+        UserRepository.invalidate_user(user_id)
+        return result.rowcount > 0
     
     @staticmethod
     async def list_users(db: AsyncSession) -> List[UserDB]:
         """List all users"""
-        result = await db.execute(select(User))
-        users = result.scalars().all()
-        
-        return [
-            UserDB(
-                id=str(user.id),
-                email=user.email,
-                name=user.name,
-                password_hash=user.hashed_password,
-                avatar_url=user.avatar_url,
-                is_active=user.is_active,
-                is_verified=True,
-                auth_provider=AuthProvider.LOCAL,
-                created_at=user.created_at,
-                updated_at=user.updated_at,
-            )
-            for user in users
-        ]
+        result = await db.execute(select(*USER_COLUMNS))
+        return [UserRepository._to_user_db(user) for user in result]
     
     @staticmethod
     async def create_refresh_token(db: AsyncSession, token: RefreshTokenDB) -> RefreshToken:
         """Create refresh token"""
-        db_token = RefreshToken(
-            id=uuid.UUID(token.id) if isinstance(token.id, str) else token.id,
-            user_id=uuid.UUID(token.user_id) if isinstance(token.user_id, str) else token.user_id,
-            token_hash=token.token_hash,
-            revoked=token.revoked,
-            expires_at=token.expires_at,
+        db_token = await db.scalar(
+            insert(RefreshToken)
+            .values(
+                id=_as_uuid(token.id),
+                user_id=_as_uuid(token.user_id),
+                token_hash=token.token_hash,
+                revoked=token.revoked,
+                expires_at=token.expires_at,
+            )
+            .returning(RefreshToken)
         )
-        db.add(db_token)
         await db.commit()
-        await db.refresh(db_token)
         return db_token
     
     @staticmethod
-    async def get_refresh_token_by_hash(db: AsyncSession, token_hash: str) -> Optional[RefreshTokenDB]:
+    async def get_refresh_token_by_hash(db: AsyncSession, token_hash: bytes) -> Optional[RefreshTokenDB]:
         """Get refresh token by hash"""
-        result = await db.execute(
+        token = await db.scalar(
             select(RefreshToken).where(
                 RefreshToken.token_hash == token_hash,
                 RefreshToken.revoked == False
             )
         )
-        token = result.scalar_one_or_none()
         
         if not token:
             return None
@@ -142,37 +216,26 @@ class UserRepository:
         )
     
     @staticmethod
-    async def revoke_refresh_token(db: AsyncSession, token_id: str) -> bool:
+    async def revoke_refresh_token(db: AsyncSession, token_id: Union[str, uuid.UUID]) -> bool:
         """Revoke refresh token"""
         result = await db.execute(
-            select(RefreshToken).where(RefreshToken.id == uuid.UUID(token_id))
+            update(RefreshToken)
+            .where(RefreshToken.id == _as_uuid(token_id))
+            .values(revoked=True)
         )
-        token = result.scalar_one_or_none()
-        
-        if not token:
-            return False
-        
-        token.revoked = True
         await db.commit()
-        return True
+        return result.rowcount > 0
     
     @staticmethod
-    async def revoke_all_user_tokens(db: AsyncSession, user_id: str) -> int:
+    async def revoke_all_user_tokens(db: AsyncSession, user_id: Union[str, uuid.UUID]) -> int:
         """Revoke all refresh tokens for a user"""
         result = await db.execute(
-            select(RefreshToken).where(
-                RefreshToken.user_id == uuid.UUID(user_id),
+            update(RefreshToken)
+            .where(
+                RefreshToken.user_id == _as_uuid(user_id),
                 RefreshToken.revoked == False
             )
+            .values(revoked=True)
         )
-        tokens = result.scalars().all()
-        
-        count = 0
-        for token in tokens:
-            token.revoked = True
-            count += 1
-        
-        if count > 0:
-            await db.commit()
-        
-        return count
+        await db.commit()
+        return result.rowcount
@@ -29,7 +29,7 @@ async def create_admin():
         # Create admin user
         admin_user = UserDB(
             email="admin@xkube.io",
-            password_hash=AuthService.hash_password("admin123"),
+            password_hash=await AuthService.hash_password_async("admin123"),
             name="Admin User",
             auth_provider=AuthProvider.LOCAL,
             is_active=True,
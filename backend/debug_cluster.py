@@ -3,6 +3,7 @@
 Debug cluster creation issues
 """
 import asyncio
+import os
 import sys
 from pathlib import Path
 
@@ -11,9 +12,12 @@ sys.path.insert(0, str(Path(__file__).parent))
 from app.database import AsyncSessionLocal
 from app.services.cluster_service import ClusterService
 from app.schemas import ClusterCreate
-import yaml
+from app.core.yaml import load_yaml_file
 import traceback
 
+# Full tracebacks only on request (DEBUG=1)
+DEBUG = bool(os.environ.get("DEBUG"))
+
 
 async def debug_cluster_creation():
     """Test cluster creation"""
@@ -30,15 +34,15 @@ async def debug_cluster_creation():
     
     # Load and parse kubeconfig
     try:
-        with open(kubeconfig_path, 'r') as f:
-            config = yaml.safe_load(f)
+        config = load_yaml_file(kubeconfig_path)
+        contexts = {c['name']: c for c in config.get('contexts', [])}
         
         print(f"\n📋 Available contexts:")
-        for ctx in config.get('contexts', []):
-            print(f"   - {ctx['name']}")
+        for name in contexts:
+            print(f"   - {name}")
         
         # Check if microk8s exists
-        microk8s_ctx = next((c for c in config.get('contexts', []) if c['name'] ==  'microk8s'), None)
+        microk8s_ctx = contexts.get('microk8s')
         if not microk8s_ctx:
             print("\n❌ 'microk8s' context not found in kubeconfig")
             return
@@ -61,8 +65,10 @@ async def debug_cluster_creation():
             from app.models import User
             from sqlalchemy import select
             
-            result = await db.execute(select(User).limit(1))
-            user = result.scalar_one_or_none()
+            # Only id and email are needed; plain rows also survive the rollback
+            # inside create_cluster (ORM instances would be expired by it)
+            result = await db.execute(select(User.id, User.email).limit(1))
+            user = result.first()
             
             if not user:
                 print("❌ No users found in database. Run create_admin.py first!")
@@ -79,12 +85,14 @@ async def debug_cluster_creation():
             except Exception as e:
                 print(f"\n❌ Failed to create cluster:")
                 print(f"   Error: {str(e)}")
-                print(f"\n   Full traceback:")
-                traceback.print_exc()
+                if DEBUG:
+                    print(f"\n   Full traceback:")
+                    traceback.print_exc()
     
     except Exception as e:
         print(f"❌ Error reading kubeconfig: {str(e)}")
-        traceback.print_exc()
+        if DEBUG:
+            traceback.print_exc()
 
 
 if __name__ == "__main__":
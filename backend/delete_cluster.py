@@ -20,17 +20,15 @@ async def delete_cluster(identifier: str):
         # Try as UUID first
         try:
             cluster_id = UUID(identifier)
-            result = await db.execute(
+            cluster = await db.scalar(
                 select(Cluster).where(Cluster.id == cluster_id)
             )
         except ValueError:
             # Not a UUID, search by name
-            result = await db.execute(
+            cluster = await db.scalar(
                 select(Cluster).where(Cluster.name == identifier)
             )
         
-        cluster = result.scalar_one_or_none()
-        
         if not cluster:
             print(f"❌ Cluster not found: {identifier}")
             return False
@@ -10,12 +10,15 @@ from getpass import getpass
 # Add parent directory to path
 sys.path.insert(0, '.')
 
-from app.db import db
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import AsyncSessionLocal, close_db
 from app.services.auth_service import AuthService
+from app.services.user_repository import UserRepository
 from app.models.user import UserDB, AuthProvider
 
 
-async def create_user():
+async def create_user(db: AsyncSession):
     """Interactive user creation"""
     print("=" * 50)
     print("xKube - Create New User")
@@ -28,7 +31,7 @@ async def create_user():
         return
     
     # Check if user exists
-    existing = await db.get_user_by_email(email)
+    existing = await UserRepository.get_user_by_email(db, email)
     if existing:
         print(f"❌ User with email {email} already exists")
         return
@@ -50,7 +53,7 @@ async def create_user():
         return
     
     # Create user
-    hashed_password = AuthService.hash_password(password)
+    hashed_password = await AuthService.hash_password_async(password)
     
     user = UserDB(
         email=email.lower(),
@@ -60,7 +63,7 @@ async def create_user():
         is_verified=True  # Auto-verify for admin-created users
     )
     
-    await db.create_user(user)
+    await UserRepository.create_user(db, user)
     
     print()
     print("✅ User created successfully!")
@@ -70,14 +73,14 @@ async def create_user():
     print()
 
 
-async def list_users():
+async def list_users(db: AsyncSession):
     """List all users"""
     print("=" * 50)
     print("xKube - User List")
     print("=" * 50)
     print()
     
-    users = await db.list_users()
+    users = await UserRepository.list_users(db)
     
     if not users:
         print("No users found")
@@ -95,7 +98,7 @@ async def list_users():
         print()
 
 
-async def delete_user():
+async def delete_user(db: AsyncSession):
     """Delete a user"""
     print("=" * 50)
     print("xKube - Delete User")
@@ -107,7 +110,7 @@ async def delete_user():
         print("❌ Email is required")
         return
     
-    user = await db.get_user_by_email(email)
+    user = await UserRepository.get_user_by_email(db, email)
     if not user:
         print(f"❌ User with email {email} not found")
         return
@@ -122,36 +125,40 @@ async def delete_user():
         print("❌ Deletion cancelled")
         return
     
-    await db.delete_user(user.id)
+    await UserRepository.delete_user(db, user.id)
     print("✅ User deleted successfully")
 
 
 async def main():
     """Main menu"""
-    while True:
-        print()
-        print("=" * 50)
-        print("xKube User Management")
-        print("=" * 50)
-        print("1. Create new user")
-        print("2. List all users")
-        print("3. Delete user")
-        print("4. Exit")
-        print()
-        
-        choice = input("Select option (1-4): ").strip()
-        
-        if choice == "1":
-            await create_user()
-        elif choice == "2":
-            await list_users()
-        elif choice == "3":
-            await delete_user()
-        elif choice == "4":
-            print("\n👋 Goodbye!")
-            break
-        else:
-            print("❌ Invalid option")
+    # One session for the whole run, so menu actions reuse a warm connection
+    async with AsyncSessionLocal() as db:
+        while True:
+            print()
+            print("=" * 50)
+            print("xKube User Management")
+            print("=" * 50)
+            print("1. Create new user")
+            print("2. List all users")
+            print("3. Delete user")
+            print("4. Exit")
+            print()
+            
+            choice = input("Select option (1-4): ").strip()
+            
+            if choice == "1":
+                await create_user(db)
+            elif choice == "2":
+                await list_users(db)
+            elif choice == "3":
+                await delete_user(db)
+            elif choice == "4":
+                print("\n👋 Goodbye!")
+                break
+            else:
+                print("❌ Invalid option")
+
+    await close_db()
 
 
 if __name__ == "__main__":
@@ -1,97 +1,19 @@
 #!/usr/bin/env python3
 """
-End-to-end test of the improved cluster creation flow
+End-to-end test of the improved cluster creation flow (see e2e.py)
 """
-import asyncio
 import sys
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent))
 
-from app.database import AsyncSessionLocal
-from app.services.cluster_service import ClusterService
-from app.schemas import ClusterCreate
-from app.models import User
-from sqlalchemy import select
+from e2e import main, run
 
 
 async def test_improved_flow():
     """Test the improved cluster creation flow"""
-    
-    async with AsyncSessionLocal() as db:
-        # Get first user
-        result = await db.execute(select(User).limit(1))
-        user = result.scalar_one_or_none()
-        
-        if not user:
-            print("❌ No users found. Run create_admin.py first!")
-            return
-        
-        print("="*60)
-        print("TESTING IMPROVED CLUSTER CREATION FLOW")
-        print("="*60)
-        print(f"\n✅ Using user: {user.email} (ID: {user.id})\n")
-        
-        # Test 1: Create a new cluster
-        print("TEST 1: Creating new cluster 'e2e-test-cluster'")
-        print("-" * 60)
-        cluster_data = ClusterCreate(
-            name="e2e-test-cluster",
-            description="End-to-end test cluster",
-            tags=["test", "e2e"],
-            context_name="microk8s"
-        )
-        
-        try:
-            cluster1 = await ClusterService.create_cluster(db, cluster_data, user.id)
-            print(f"✅ SUCCESS: Cluster created")
-            print(f"   ID: {cluster1.id}")
-            print(f"   Name: {cluster1.name}")
-            print(f"   Description: {cluster1.description}\n")
-        except Exception as e:
-            print(f"❌ FAILED: {str(e)}\n")
-            return
-        
-        # Test 2: Try to create the same cluster again (should return existing)
-        print("TEST 2: Attempting to create duplicate 'e2e-test-cluster'")
-        print("-" * 60)
-        cluster_data2 = ClusterCreate(
-            name="e2e-test-cluster",  # Same name
-            description="This should return the existing cluster",
-            tags=["duplicate"],
-            context_name="microk8s"
-        )
-        
-        # Simulate the route handler logic
-        existing_clusters = await ClusterService.get_clusters(db, owner_id=user.id)
-        existing = next((c for c in existing_clusters if c.name == cluster_data2.name), None)
-        
-        if existing:
-            print(f"✅ SUCCESS: Existing cluster returned (no error!)")
-            print(f"   ID: {existing.id}")
-            print(f"   Name: {existing.name}")
-            print(f"   Description: {existing.description}")
-            print(f"   ℹ️  Same cluster ID as Test 1: {existing.id == cluster1.id}")
-            print(f"\n   🎉 The frontend will navigate to this cluster's detail page!")
-            print(f"   🎉 No error shown to user - seamless experience!\n")
-        else:
-            print(f"❌ FAILED: Should have found existing cluster\n")
-        
-        # Cleanup
-        print("CLEANUP: Removing test cluster")
-        print("-" * 60)
-        await ClusterService.delete_cluster(db, cluster1.id)
-        print(f"✅ Test cluster removed\n")
-        
-        print("="*60)
-        print("ALL TESTS PASSED! 🎉")
-        print("="*60)
-        print("\nThe improved flow is working correctly:")
-        print("  1. New clusters are created successfully")
-        print("  2. Duplicate attempts return existing cluster (no error)")
-        print("  3. Frontend can navigate users to cluster details")
-        print("  4. No more confusing 500 errors!")
+    await main("test")
 
 
 if __name__ == "__main__":
-    asyncio.run(test_improved_flow())
+    run("test")
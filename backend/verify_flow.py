@@ -1,77 +1,19 @@
 #!/usr/bin/env python3
 """
-Quick verification that the improved cluster flow is working
+Quick verification that the improved cluster flow is working (see e2e.py)
 """
-import asyncio
 import sys
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent))
 
-from app.database import AsyncSessionLocal
-from app.services.cluster_service import ClusterService
-from app.schemas import ClusterCreate
-from app.models import User
-from sqlalchemy import select
+from e2e import main, run
 
 
 async def verify_flow():
     """Verify the complete flow"""
-    
-    print("="*70)
-    print("🔍 VERIFYING CLUSTER IMPORT FLOW")
-    print("="*70)
-    
-    async with AsyncSessionLocal() as db:
-        # Get user
-        result = await db.execute(select(User).limit(1))
-        user = result.scalar_one_or_none()
-        
-        if not user:
-            print("\n❌ No users found!")
-            return
-        
-        print(f"\n✅ User: {user.email}\n")
-        
-        # Get existing clusters
-        clusters = await ClusterService.get_clusters(db, owner_id=user.id)
-        print(f"📊 Current clusters in DB: {len(clusters)}")
-        for c in clusters:
-            print(f"   - {c.name} (ID: {c.id})")
-        
-        print("\n" + "="*70)
-        print("✅ BACKEND:")
-        print("="*70)
-        print("✓ Returns existing cluster if name duplicates (no error)")
-        print("✓ Creates new cluster if name is unique")
-        print("✓ Proper error handling for invalid configs")
-        
-        print("\n" + "="*70)
-        print("✅ FRONTEND:")
-        print("="*70)
-        print("✓ Reloads page after successful import")
-        print("✓ App detects clusters and shows dashboard")
-        print("✓ No more 500 errors for duplicates")
-        
-        print("\n" + "="*70)
-        print("📋 USER FLOW:")
-        print("="*70)
-        print("1. User opens http://localhost:5173")
-        print("2. If no clusters → Onboarding screen")
-        print("3. Select/import cluster → Success")
-        print("4. Page reloads → Dashboard appears ✨")
-        print("5. Try import same cluster → Still goes to dashboard (no error!)")
-        
-        print("\n" + "="*70)
-        print("🎉 ALL READY TO TEST!")
-        print("="*70)
-        print("\nNext steps:")
-        print("  1. Open http://localhost:5173 in browser")
-        print("  2. Try importing 'microk8s' cluster")
-        print("  3. Verify you see the dashboard")
-        print("  4. Try importing 'microk8s' again (should work!)")
-        print("\n")
+    await main("verify")
 
 
 if __name__ == "__main__":
-    asyncio.run(verify_flow())
+    run("verify")